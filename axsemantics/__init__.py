@@ -1,13 +1,53 @@
 # AX-Semantics Python bindings
 # API docs at https://apidocs.ax-semantics.com
+import importlib
+
 import axsemantics.constants
-from axsemantics.errors import (
-    APIConnectionError,
-    APIError,
-    AuthenticationError,
-)
-from axsemantics.resources import (
-    ContentProject,
-    Thing,
-)
-from axsemantics.utils import login
+
+# Everything else is imported on first access (PEP 562), so that importing
+# the package does not load requests, aiohttp or modules a script never uses.
+_exports = {
+    'AsyncSessionPool': 'aio',
+    'close_async_sessions': 'aio',
+    'TokenCache': 'auth',
+    'disable_cache': 'cache',
+    'enable_cache': 'cache',
+    'Client': 'client',
+    'APIConnectionError': 'errors',
+    'APIError': 'errors',
+    'AuthenticationError': 'errors',
+    'CircuitOpenError': 'errors',
+    'ImportJournal': 'journal',
+    'ProjectMirror': 'mirror',
+    'SessionPool': 'net',
+    'close_sessions': 'net',
+    'FileTokenBucket': 'ratelimit',
+    'TokenBucket': 'ratelimit',
+    'ContentProject': 'resources',
+    'Thing': 'resources',
+    'CircuitBreaker': 'retry',
+    'RetryPolicy': 'retry',
+    'login': 'utils',
+}
+
+__all__ = sorted(_exports)
+
+
+def __getattr__(name):
+    module = _exports.get(name)
+    if module is None:
+        # submodules, such as axsemantics.resources, used to be loaded by
+        # the package import as well
+        try:
+            return importlib.import_module('{}.{}'.format(__name__, name))
+        except ModuleNotFoundError as error:
+            if error.name != '{}.{}'.format(__name__, name):
+                raise
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module('{}.{}'.format(__name__, module)), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
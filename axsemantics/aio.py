@@ -0,0 +1,191 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+from axsemantics import (
+    constants,
+    instrumentation,
+)
+from axsemantics.errors import (
+    APIConnectionError,
+    APIError,
+)
+from axsemantics.net import (
+    REAUTHENTICATE,
+    RESEND,
+    RequestHandler,
+)
+
+aiohttp = None
+
+
+def load_aiohttp():
+    # aiohttp is optional and slow to import, so it is only loaded once the
+    # asyncio client is used
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('The asyncio client requires aiohttp to be installed.') from None
+    return aiohttp
+
+
+class AsyncResponse:
+    # Mimics the parts of requests.Response that APIError and friends use.
+    def __init__(self, method, url, status_code, headers, content, body=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.request = SimpleNamespace(method=method.upper(), url=url, body=body)
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+
+class AsyncSessionPool:
+    # aiohttp sessions are bound to the event loop they were created in, so
+    # sessions are kept per loop in addition to per (api_base, token).
+    def __init__(self, limit=None, limit_per_host=None, keep_alive=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keep_alive = keep_alive
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def get(self, api_base=None, token=None):
+        loop = asyncio.get_running_loop()
+        key = (loop, api_base or constants.API_BASE, token)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or session.closed:
+                session = self._sessions[key] = self.create_session(token)
+        return session
+
+    def create_session(self, token=None):
+        aiohttp = load_aiohttp()
+        connector = aiohttp.TCPConnector(
+            limit=self._setting('limit', 'ASYNC_POOL_LIMIT'),
+            limit_per_host=self._setting('limit_per_host', 'ASYNC_POOL_LIMIT_PER_HOST'),
+            force_close=not self._setting('keep_alive', 'KEEP_ALIVE'),
+        )
+        headers = {'User-Agent': 'AXSemantics Python Client'}
+        if token:
+            headers['Authorization'] = 'Token {}'.format(token)
+        return aiohttp.ClientSession(connector=connector, headers=headers)
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [key for key in self._sessions if key[0] is loop]
+            sessions = [self._sessions.pop(key) for key in keys]
+        for session in sessions:
+            await session.close()
+
+    def _setting(self, attribute, constant):
+        value = getattr(self, attribute)
+        return getattr(constants, constant) if value is None else value
+
+
+default_async_pool = AsyncSessionPool()
+
+
+async def _aiter(chunks):
+    # aiohttp streams request bodies from async iterables only
+    for chunk in chunks:
+        yield chunk
+
+
+async def close_async_sessions():
+    await default_async_pool.close()
+
+
+class AsyncRequestHandler(RequestHandler):
+    def __init__(self, token=None, api_base=None, pool=None, retry=None, rate_limiter=None, client=None,
+                 single_flight=None):
+        if pool is None:
+            pool = client.async_pool if client is not None else default_async_pool
+        super(AsyncRequestHandler, self).__init__(
+            token=token, api_base=api_base, pool=pool, retry=retry,
+            rate_limiter=rate_limiter, client=client, single_flight=single_flight,
+        )
+
+    async def request(self, method, url, params, user_headers=None):
+        return self.decode(await self.send(method, url, params, user_headers))
+
+    async def send(self, method, url, params, user_headers=None):
+        url, headers = self.prepare(method, url, params, user_headers)
+        if self.single_flight is None or method not in constants.COALESCE_METHODS:
+            return await self.transmit(method, url, headers, params)
+        return await self.single_flight.ado(
+            self.flight_key(method, url, headers),
+            lambda: self.transmit(method, url, headers, params),
+            self.joined(method, url),
+        )
+
+    async def transmit(self, method, url, headers, params):
+        attempt = 1
+        reauthenticated = False
+        while True:
+            try:
+                return await self.attempt(method, url, headers, params, attempt)
+            except (APIConnectionError, APIError) as error:
+                step = self.recover(method, url, attempt, error, reauthenticated)
+                if step is None:
+                    raise
+            if step is REAUTHENTICATE:
+                reauthenticated = True
+                loop = asyncio.get_running_loop()
+                token = await loop.run_in_executor(None, self.authenticator.refresh, self.token)
+                headers = self.reauthenticate(token, headers)
+            elif step is not RESEND:
+                await asyncio.sleep(step)
+                attempt += 1
+
+    async def attempt(self, method, url, headers, params, attempt=1):
+        body = self.begin_attempt(method, params)
+        event = None
+        try:
+            if self.rate_limiter:
+                await self.rate_limiter.aacquire()
+            event = instrumentation.start_request(method, url, attempt) if instrumentation.hooks else None
+            result = await self.request_and_raise(method, url, headers, body)
+        except BaseException as error:
+            self.end_attempt(event, body, error=error)
+            raise
+        self.end_attempt(event, body, result)
+        return result
+
+    async def request_and_raise(self, method, url, headers, body=None):
+        aiohttp = load_aiohttp()
+        data = None
+        if body is not None:
+            headers = dict(headers, **body.headers)
+            data = body.data if isinstance(body.data, bytes) else _aiter(body.data)
+
+        try:
+            async with self.session.request(
+                method, url, headers=headers, data=data,
+                timeout=aiohttp.ClientTimeout(total=5),
+            ) as response:
+                result = AsyncResponse(
+                    method, url, response.status, response.headers,
+                    await response.read(), data,
+                )
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            raise APIConnectionError
+
+        if result.status_code >= 400:
+            if constants.DEBUG:
+                print('Got unexpected reponse with status {}.'.format(result.status_code))
+                print('Content: {}'.format(result.content))
+            raise APIError(result)
+        return result
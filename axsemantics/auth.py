@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from axsemantics import constants
+from axsemantics.errors import (
+    APIError,
+    AuthenticationError,
+)
+
+
+class TokenCache:
+    # Tokens by (user, api_base), kept in memory and, given a path, in a JSON
+    # file readable only by the owner, so that short-lived processes can skip
+    # the login request. Entries older than max_age are ignored.
+    def __init__(self, path=None, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(user, api_base):
+        return '{} {}'.format(api_base, user)
+
+    def get(self, user, api_base):
+        key = self.key(user, api_base)
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is None and self.path:
+                entry = self._read().get(key)
+        if entry is None or (self.max_age and time.time() - entry['created'] > self.max_age):
+            return None
+        return entry['token']
+
+    def set(self, user, api_base, token):
+        self._change(self.key(user, api_base), {'token': token, 'created': time.time()})
+
+    def discard(self, user, api_base):
+        self._change(self.key(user, api_base), None)
+
+    def clear(self):
+        with self._lock:
+            self._tokens = {}
+            if self.path:
+                self._write({})
+
+    def _change(self, key, entry):
+        with self._lock:
+            stores = [self._tokens]
+            if self.path:
+                stored = self._read()
+                stores.append(stored)
+            for tokens in stores:
+                if entry is None:
+                    tokens.pop(key, None)
+                else:
+                    tokens[key] = entry
+            if self.path:
+                self._write(stored)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, tokens):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, path = tempfile.mkstemp(dir=directory, prefix='.axsemantics-tokens')
+        try:
+            os.chmod(path, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tokens, f)
+            os.replace(path, self.path)
+        except BaseException:
+            os.unlink(path)
+            raise
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    # shared cache following constants.TOKEN_CACHE and TOKEN_CACHE_MAX_AGE
+    global _token_cache
+    settings = (constants.TOKEN_CACHE, constants.TOKEN_CACHE_MAX_AGE)
+    if _token_cache is None or (_token_cache.path, _token_cache.max_age) != settings:
+        _token_cache = TokenCache(*settings)
+    return _token_cache
+
+
+def authenticate(user, password, requestor):
+    data = {
+        'email': user,
+        'password': password,
+    }
+
+    try:
+        response = requestor.request(
+            url='/{}/rest-auth/login/'.format(constants.API_VERSION),
+            method='post',
+            params=data,
+        )
+    except APIError as error:
+        if hasattr(error, 'request') and error.request.status_code == 400:
+            raise AuthenticationError(error.request) from None
+        else:
+            raise
+
+    if constants.DEBUG:
+        print('Received authentication token {}.'.format(response['key']))
+    return response['key']
+
+
+class Authenticator:
+    # Logs in with stored credentials, using the token cache, and logs in
+    # again when the API rejects a token. requestor() must return a request
+    # handler that sends no token.
+    def __init__(self, user, password, api_base, requestor, cache=None):
+        self.user = user
+        self.password = password
+        self.api_base = api_base
+        self.requestor = requestor
+        self.cache = cache
+        self.token = None
+        self._lock = threading.Lock()
+
+    def login(self, force=False):
+        with self._lock:
+            return self._login(force)
+
+    def refresh(self, rejected_token):
+        # Concurrent callers holding the same rejected token wait for a
+        # single login and share its token.
+        with self._lock:
+            if self.token is not None and self.token != rejected_token:
+                return self.token
+            return self._login(force=True)
+
+    def _login(self, force):
+        cache = get_token_cache() if self.cache is None else self.cache
+        if force:
+            if cache:
+                cache.discard(self.user, self.api_base)
+        elif cache:
+            self.token = cache.get(self.user, self.api_base)
+            if self.token:
+                return self.token
+
+        self.token = authenticate(self.user, self.password, self.requestor())
+        if cache:
+            cache.set(self.user, self.api_base, self.token)
+        return self.token
+
+
+_authenticators = {}
+
+
+def get_authenticator(api_base=None):
+    return _authenticators.get(api_base or constants.API_BASE)
+
+
+def set_authenticator(authenticator):
+    _authenticators[authenticator.api_base] = authenticator
@@ -1,9 +1,20 @@
-import requests
-
-from axsemantics import constants
+import asyncio
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from axsemantics import (
+    constants,
+    instrumentation,
+)
+from axsemantics.aio import AsyncRequestHandler
+from axsemantics.cache import get_cache
 from axsemantics.net import RequestHandler
+from axsemantics.records import Record
 from axsemantics.utils import (
     create_object,
+    register_type,
     _get_update_dict,
 )
 
@@ -11,12 +22,13 @@ from axsemantics.utils import (
 class AXSemanticsObject(dict):
     class_name = 'AXSemanticsObject'
 
-    def __init__(self, api_token=None, api_base=None, **kwargs):
+    def __init__(self, api_token=None, api_base=None, client=None, **kwargs):
         super(AXSemanticsObject, self).__init__()
         self._unsaved_attributes = set()
         self._params = kwargs
         self._previous = None
-        self.api_base = api_base or constants.API_BASE
+        self.client = client
+        self.api_base = api_base or (client.api_base if client is not None else constants.API_BASE)
 
         self['id'] = kwargs.get('id', None)
         object.__setattr__(self, 'api_token', api_token)
@@ -26,6 +38,57 @@ class AXSemanticsObject(dict):
             self._unsaved_attributes.add(key)
         return super(AXSemanticsObject, self).update(update_dict)
 
+    def __getitem__(self, key):
+        return self._hydrate(key, super().__getitem__(key))
+
+    def _hydrate(self, key, value):
+        # Nested data from the server is stored as parsed and only wrapped
+        # (and thereby copied) when it is handed out, see load_data. Every
+        # accessor returning values goes through here, as the parsed data is
+        # the diff baseline and may be shared with the response cache.
+        if isinstance(value, (dict, list)) and self._previous is not None and value is self._previous.get(key):
+            value = create_object(value, self.api_token, client=self.client)
+            super().__setitem__(key, value)
+        return value
+
+    def _hydrate_all(self):
+        for key, value in list(super().items()):
+            self._hydrate(key, value)
+
+    def __iter__(self):
+        # overridden so that dict(obj) and {**obj} read values through
+        # __getitem__ instead of copying the stored ones
+        return super().__iter__()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        self._hydrate_all()
+        return super().items()
+
+    def values(self):
+        self._hydrate_all()
+        return super().values()
+
+    def copy(self):
+        self._hydrate_all()
+        return super().copy()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            self[key]
+        return super().pop(key, *default)
+
+    def popitem(self):
+        self._hydrate_all()
+        return super().popitem()
+
     def __setitem__(self, key, value):
         self._unsaved_attributes.add(key)
         return super().__setitem__(key, value)
@@ -35,8 +98,8 @@ class AXSemanticsObject(dict):
         return super(AXSemanticsObject, self).__delitem__(key)
 
     @classmethod
-    def create_from_dict(cls, data, api_token=None, **kwargs):
-        instance = cls(api_token=api_token, **kwargs)
+    def create_from_dict(cls, data, api_token=None, client=None, **kwargs):
+        instance = cls(api_token=api_token, client=client, **kwargs)
         instance.load_data(data, api_token=api_token)
         return instance
 
@@ -50,26 +113,41 @@ class AXSemanticsObject(dict):
             self.clear()
 
         if data:
-            for key, value in data.items():
-                super().__setitem__(key, create_object(value, api_token, _type=self.class_name))
+            # the stored values, without hydrating those of an object
+            super().update(dict.items(data) if isinstance(data, dict) else data)
+
+        # keep the raw response around, not objects shared with this instance
+        self._previous = data._previous if isinstance(data, AXSemanticsObject) else data
 
-        self._previous = data
+    def requestor(self):
+        return RequestHandler(token=self.api_token, api_base=self.api_base, client=self.client)
+
+    def arequestor(self):
+        return AsyncRequestHandler(token=self.api_token, api_base=self.api_base, client=self.client)
 
     def request(self, method, url, params=None, headers=None):
         params = params or self._params
-        requestor = RequestHandler(
-            token=self.api_token,
-            api_base=self.api_base or constants.API_BASE,
-        )
-        response = requestor.request(method, url, params, headers)
-        return create_object(response, self.api_token, _type=self.class_name)
+        response = self.requestor().request(method, url, params, headers)
+        return create_object(response, self.api_token, _type=self.class_name, client=self.client)
+
+    async def arequest(self, method, url, params=None, headers=None):
+        params = params or self._params
+        response = await self.arequestor().request(method, url, params, headers)
+        return create_object(response, self.api_token, _type=self.class_name, client=self.client)
+
+    def dirty_fields(self):
+        previous = self._previous or {}
+        return {
+            key: value for key, value in dict.items(self)
+            if key != 'id' and (key not in previous or previous[key] != value)
+        }
 
     def serialize(self, previous):
         params = {}
         unsaved_keys = self._unsaved_attributes or set()
         previous = previous or self._previous or {}
 
-        for key, value in self.items():
+        for key, value in dict.items(self):
             if key == 'id' or (isinstance(key, str) and key.startswith('_')) or isinstance(value, APIResource):
                 continue
             if hasattr(value, 'serialize'):
@@ -80,20 +158,68 @@ class AXSemanticsObject(dict):
         return params
 
 
+register_type(AXSemanticsObject)
+
+
 class APIResource(AXSemanticsObject):
     @classmethod
     def retrieve(cls, id, api_token=None, **kwargs):
-        instance = cls(api_token, id=id, **kwargs)
+        instance = cls(api_token=api_token, id=id, **kwargs)
         instance.refresh()
         return instance
 
     def refresh(self):
-        self.load_data(self.request('get', self.instance_url()))
+        cache = get_cache()
+        if cache is None:
+            self.load_data(self.request('get', self.instance_url()))
+            return self
+
+        key = self.cache_key()
+        entry = cache.lookup(key)
+        if entry is None or not entry.fresh:
+            requestor = self.requestor()
+            result = requestor.send('get', self.instance_url(), self._params, cache.revalidation_headers(entry))
+            data = cache.store(key, result, entry, requestor.decode(result))
+        else:
+            data = entry.data
+        self.load_data(create_object(data, self.api_token, _type=self.class_name, client=self.client))
         return self
 
+    @classmethod
+    async def aretrieve(cls, id, api_token=None, **kwargs):
+        instance = cls(api_token=api_token, id=id, **kwargs)
+        await instance.arefresh()
+        return instance
+
+    async def arefresh(self):
+        cache = get_cache()
+        if cache is None:
+            self.load_data(await self.arequest('get', self.instance_url()))
+            return self
+
+        key = self.cache_key()
+        entry = cache.lookup(key)
+        if entry is None or not entry.fresh:
+            requestor = self.arequestor()
+            result = await requestor.send('get', self.instance_url(), self._params, cache.revalidation_headers(entry))
+            data = cache.store(key, result, entry, requestor.decode(result))
+        else:
+            data = entry.data
+        self.load_data(create_object(data, self.api_token, _type=self.class_name, client=self.client))
+        return self
+
+    def cache_key(self):
+        requestor = self.requestor()
+        return get_cache().key(requestor.base, requestor.token, self.instance_url())
+
+    def invalidate_cache(self):
+        cache = get_cache()
+        if cache is not None and self.get('id', None):
+            cache.invalidate(self.cache_key())
+
     @classmethod
     def class_name(cls):
-        return str(requests.utils.quote(cls.__name__.lower()))
+        return quote(cls.__name__.lower())
 
     @classmethod
     def class_url(cls):
@@ -102,35 +228,66 @@ class APIResource(AXSemanticsObject):
     def instance_url(self):
         if self.get('id', None):
             id = self['id']
-            return '{}{}/'.format(self.class_url(), requests.utils.quote(str(id)))
+            return '{}{}/'.format(self.class_url(), quote(str(id)))
         else:
             return self.class_url()
 
 
 class ListResource:
-    def __init__(self, class_name, initial_url, api_token=None, api_base=None):
+    filter_fields = ()
+
+    def __init__(self, class_name, initial_url, api_token=None, api_base=None, fetch=True,
+                 page_size=None, prefetch=None, compact=False, params=None, client=None):
         self.current_index = None
         self.current_list = None
         self.next_page = 1
-        self._params = None
+        self._params = params
         self.length = 0
-        self.api_base = api_base or constants.API_BASE
-        self.api_token = api_token or constants.API_TOKEN
+        self.client = client
+        self.api_base = api_base or (client.api_base if client is not None else constants.API_BASE)
+        # None uses the token of the client or the global one at request
+        # time, so that pages and items follow a new login
+        self.api_token = api_token
         self.class_name = class_name
         self.initial_url = initial_url
-        self._update()
+        self.page_size = page_size or constants.LIST_PAGE_SIZE
+        self.prefetch = constants.LIST_PREFETCH if prefetch is None else prefetch
+        self.compact = compact
+        self._item_kwargs = {}
+        self._indexes = {}
+        self._index_lock = threading.Lock()
+        self._page_length = None
+        self._scheduled_page = 1
+        self._pages = {}
+        self._executor = None
+        if fetch:
+            self._update()
 
     def __iter__(self):
         return self
 
     def __next__(self):
-        if self.current_index >= len(self.current_list):
+        while self.current_list is None or self.current_index >= len(self.current_list):
             if self.next_page:
                 self._update()
             else:
+                self.close()
                 raise StopIteration
         self.current_index += 1
-        return create_object(self.current_list[self.current_index - 1], api_token=self.api_token, _type=self.class_name)
+        return self._create_item(self.current_list[self.current_index - 1])
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while self.current_list is None or self.current_index >= len(self.current_list):
+            if self.next_page:
+                await self._aupdate()
+            else:
+                self.close()
+                raise StopAsyncIteration
+        self.current_index += 1
+        return self._create_item(self.current_list[self.current_index - 1])
 
     def __len__(self):
         return self.length
@@ -138,24 +295,162 @@ class ListResource:
     def __repr__(self):
         return 'List of {} objects of type "{}"'.format(len(self), self.class_name)
 
-    def _update(self, params=None):
-        if self.next_page > 1:
-            params = {'page': self.next_page}
+    def __enter__(self):
+        return self
 
-        requestor = RequestHandler(token=self.api_token)
-        response = requestor.request('get', self.initial_url, params)
+    def __exit__(self, *args):
+        self.close()
 
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        for page in self._pages.values():
+            page.cancel()
+        self._pages = {}
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _create_item(self, data):
+        if self.compact:
+            return Record(data, self.class_name, self.api_token, self.api_base, self._item_kwargs, self.client)
+        return create_object(data, api_token=self.api_token, _type=self.class_name, client=self.client,
+                             **self._item_kwargs)
+
+    def _page_params(self, page, params=None):
+        params = dict(params or self._params or {})
+        if page > 1:
+            params['page'] = page
+        if self.page_size:
+            params['page_size'] = self.page_size
+        return params or None
+
+    def _page_count(self):
+        if not self._page_length:
+            return 1
+        return -(-self.length // self._page_length)
+
+    def _load_page(self, response, page):
+        if instrumentation.hooks:
+            instrumentation.page(self.initial_url, page, len(response['results']))
         self.current_index = 0
         self.length = response['count']
         self.current_list = response['results']
+        if page == 1:
+            self._page_length = self.page_size or len(self.current_list)
 
         if response['next']:
-            self.next_page += 1
+            self.next_page = page + 1
         else:
             self.next_page = None
 
+    def _schedule_pages(self, fetch):
+        # Keeps up to `prefetch` pages after the current one in flight. The
+        # page count is derived from the `count` of the first response.
+        if not self.prefetch or not self.next_page:
+            return
+        depth = self._page_count() if self.prefetch == 'all' else self.prefetch
+        last = min(self._page_count(), self.next_page + depth - 1)
+        for page in range(max(self.next_page, self._scheduled_page + 1), last + 1):
+            self._pages[page] = fetch(page)
+        self._scheduled_page = max(self._scheduled_page, last)
+
+    def _fetch_page(self, page, params=None):
+        requestor = RequestHandler(token=self.api_token, api_base=self.api_base, client=self.client)
+        return requestor.request('get', self.initial_url, self._page_params(page, params))
+
+    def _submit_page(self, page):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=constants.LIST_PREFETCH_WORKERS)
+        return self._executor.submit(self._fetch_page, page)
+
+    def _update(self, params=None):
+        page = self.next_page
+        future = self._pages.pop(page, None)
+        response = future.result() if future else self._fetch_page(page, params)
+        self._load_page(response, page)
+        self._schedule_pages(self._submit_page)
+
+    async def _afetch_page(self, page, params=None):
+        requestor = AsyncRequestHandler(token=self.api_token, api_base=self.api_base, client=self.client)
+        return await requestor.request('get', self.initial_url, self._page_params(page, params))
+
+    async def _aupdate(self, params=None):
+        page = self.next_page
+        task = self._pages.pop(page, None)
+        response = await task if task else await self._afetch_page(page, params)
+        self._load_page(response, page)
+        self._schedule_pages(lambda page: asyncio.ensure_future(self._afetch_page(page)))
+
     def get(self, **kwargs):
-        for item in self:
-            if all([item[key] == kwargs[key] for key in kwargs]):
-                return item
+        # Lookups on fields the API can filter by are sent to the server,
+        # everything else is answered from an index built on first use.
+        # Values that cannot be hashed, such as dicts, are compared one by
+        # one instead.
+        if kwargs and set(kwargs) <= set(self.filter_fields):
+            return self._find(kwargs, params=dict(self._params or {}, **kwargs))
+
+        fields = tuple(sorted(kwargs))
+        key = tuple(kwargs[field] for field in fields)
+        try:
+            hash(key)
+        except TypeError:
+            return self._find(kwargs)
+        data = self._get_index(fields).get(key)
+        return self._create_item(data) if data is not None else None
+
+    def _find(self, kwargs, params=None):
+        # returns early, so the prefetched pages of the rest are cancelled
+        with self._clone(params=params) as items:
+            for item in items:
+                if all(item.get(key) == value for key, value in kwargs.items()):
+                    return self._create_item(item.to_dict())
         return None
+
+    def get_many(self, uids, field='uid'):
+        index = self._get_index((field,))
+        return [
+            self._create_item(index[(uid,)]) if (uid,) in index else None
+            for uid in uids
+        ]
+
+    def drop_indexes(self):
+        # the indexes hold the data of the whole collection
+        with self._index_lock:
+            self._indexes = {}
+
+    def _get_index(self, fields):
+        # Each index is built from its own pass over the collection, so that
+        # only the indexes are kept in memory. Items with values that cannot
+        # be hashed cannot match a hashable lookup and are left out.
+        with self._index_lock:
+            if fields not in self._indexes:
+                index = {}
+                for item in self._clone():
+                    key = tuple(item.get(field) for field in fields)
+                    try:
+                        if key not in index:
+                            index[key] = item.to_dict()
+                    except TypeError:
+                        pass
+                self._indexes[fields] = index
+            return self._indexes[fields]
+
+    def _clone(self, params=None):
+        # a fresh list over the same collection, independent of the
+        # iteration state of this one
+        clone = copy.copy(self)
+        clone.current_index = None
+        clone.current_list = None
+        clone.next_page = 1
+        clone.compact = True
+        clone._scheduled_page = 1
+        clone._pages = {}
+        clone._executor = None
+        if params is not None:
+            clone._params = params
+        return clone
@@ -0,0 +1,38 @@
+from collections import namedtuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import islice
+
+from axsemantics import constants
+from axsemantics.errors import AXSemanticsError
+
+
+BulkResult = namedtuple('BulkResult', ['item', 'result', 'error'])
+
+
+def bulk_map(function, items, max_workers=None, max_pending=None):
+    # Yields a BulkResult per item in completion order. At most max_pending
+    # items are taken from the input at a time, so arbitrarily long
+    # iterables can be processed in constant memory.
+    max_workers = max_workers or constants.BULK_MAX_WORKERS
+    max_pending = max(max_pending or 2 * max_workers, 1)
+    items = iter(items)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            for item in islice(items, max_pending - len(pending)):
+                pending[executor.submit(function, item)] = item
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield BulkResult(item, future.result(), None)
+                except AXSemanticsError as error:
+                    yield BulkResult(item, None, error)
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    __slots__ = ('data', 'etag', 'last_modified', 'expires')
+
+    def __init__(self, data, etag=None, last_modified=None, expires=0):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    @property
+    def fresh(self):
+        return time.monotonic() < self.expires
+
+
+class ResourceCache:
+    # LRU cache of raw API responses keyed by (api_base, token, url). Stale
+    # entries are kept so that they can be revalidated with a conditional GET.
+    # Every lookup is a hit or a miss; stale counts the misses that found a
+    # stale entry, and revalidations those the server answered with 304.
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def key(api_base, api_token, url):
+        return (api_base, api_token, url)
+
+    def lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.stale += 1
+        return entry
+
+    def revalidation_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers or None
+
+    def store(self, key, result, entry=None, data=None):
+        # Takes the response of a (possibly conditional) GET and returns the
+        # data to use, which is the cached data if the server answered 304.
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if entry is not None and result.status_code == 304:
+                self.revalidations += 1
+                entry.expires = expires
+                self._entries[key] = entry
+                return entry.data
+
+            self._entries[key] = CacheEntry(
+                data,
+                etag=result.headers.get('ETag'),
+                last_modified=result.headers.get('Last-Modified'),
+                expires=expires,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return data
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'revalidations': self.revalidations,
+            'size': len(self._entries),
+        }
+
+
+resource_cache = None
+
+
+def enable_cache(maxsize=1024, ttl=60):
+    global resource_cache
+    resource_cache = ResourceCache(maxsize=maxsize, ttl=ttl)
+    return resource_cache
+
+
+def disable_cache():
+    global resource_cache
+    resource_cache = None
+
+
+def get_cache():
+    return resource_cache
@@ -0,0 +1,96 @@
+from axsemantics import constants
+from axsemantics.aio import (
+    AsyncRequestHandler,
+    AsyncSessionPool,
+)
+from axsemantics.auth import Authenticator
+from axsemantics.net import (
+    RequestHandler,
+    SessionPool,
+)
+from axsemantics.resources import (
+    ContentProject,
+    ContentProjectList,
+    Thing,
+)
+from axsemantics.utils import create_object
+
+
+class Client:
+    # Owns the token, api_base and connection pools of one account, so that
+    # several accounts can be used side by side in one process. Resources
+    # created through a client, and everything loaded from them, make their
+    # requests through it instead of axsemantics.constants.API_TOKEN.
+    def __init__(self, api_token=None, api_base=None, pool=None, async_pool=None, retry=None,
+                 rate_limiter=None):
+        self.api_token = api_token
+        self.api_base = api_base or constants.API_BASE
+        self.pool = pool or SessionPool()
+        self.async_pool = async_pool or AsyncSessionPool()
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.authenticator = None
+
+    def __repr__(self):
+        return '<Client {}>'.format(self.api_base)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    def login(self, user, password, cache=None):
+        # see axsemantics.utils.login
+        self.authenticator = Authenticator(
+            user, password, self.api_base,
+            requestor=lambda: RequestHandler(token='', client=self),
+            cache=cache,
+        )
+        self.api_token = self.authenticator.login()
+        return self
+
+    def close(self):
+        self.pool.close()
+
+    async def aclose(self):
+        self.close()
+        await self.async_pool.close()
+
+    def requestor(self):
+        return RequestHandler(client=self)
+
+    def arequestor(self):
+        return AsyncRequestHandler(client=self)
+
+    def request(self, method, url, params=None, headers=None, _type=None):
+        response = self.requestor().request(method, url, params, headers)
+        return create_object(response, _type=_type, client=self)
+
+    async def arequest(self, method, url, params=None, headers=None, _type=None):
+        response = await self.arequestor().request(method, url, params, headers)
+        return create_object(response, _type=_type, client=self)
+
+    def content_project(self, id):
+        return ContentProject.retrieve(id, client=self)
+
+    async def acontent_project(self, id):
+        return await ContentProject.aretrieve(id, client=self)
+
+    def thing(self, cp_id, id):
+        return Thing.retrieve(id, cp_id=cp_id, client=self)
+
+    async def athing(self, cp_id, id):
+        return await Thing.aretrieve(id, cp_id=cp_id, client=self)
+
+    def content_projects(self, page_size=None, prefetch=None, compact=False):
+        return ContentProjectList(client=self, page_size=page_size, prefetch=prefetch, compact=compact)
+
+    def acontent_projects(self, page_size=None, prefetch=None, compact=False):
+        return ContentProjectList(client=self, page_size=page_size, prefetch=prefetch, compact=compact, fetch=False)
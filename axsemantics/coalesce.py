@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+
+class Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first
+    # caller runs the function, the others wait for and get its result or
+    # exception. Threads and asyncio tasks are tracked separately, as tasks
+    # must not block their event loop.
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        return {'calls': self.calls, 'coalesced': self.coalesced}
+
+    def do(self, key, function, joined=None):
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if joined is not None:
+                joined()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = function()
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def ado(self, key, function, joined=None):
+        key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(key)
+            leader = task is None
+            if leader:
+                task = self._tasks[key] = asyncio.ensure_future(function())
+                task.add_done_callback(lambda _: self._forget(key, task))
+            else:
+                self.coalesced += 1
+        if not leader and joined is not None:
+            joined()
+        # a cancelled caller must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+
+default_single_flight = SingleFlight()
@@ -2,4 +2,91 @@ API_BASE = 'https://api.ax-semantics.com'
 API_TOKEN = None
 API_VERSION = 'v1'
 
+# tokens from login() are cached in memory by user and api_base, and in this
+# file if set, see axsemantics.auth.TokenCache; cached tokens older than
+# TOKEN_CACHE_MAX_AGE seconds are not used
+TOKEN_CACHE = None
+TOKEN_CACHE_MAX_AGE = None
+
+# connection pool settings, see axsemantics.net.SessionPool
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+POOL_BLOCK = False
+POOL_MAX_RETRIES = 0
+KEEP_ALIVE = True
+
+# connection limits for the asyncio client, see axsemantics.aio.AsyncSessionPool
+ASYNC_POOL_LIMIT = 100
+ASYNC_POOL_LIMIT_PER_HOST = 0
+
+# retries in RequestHandler, see axsemantics.retry.RetryPolicy: attempts per
+# request, exponential backoff in seconds, and which responses and methods
+# are retried
+RETRY_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_MAX_BACKOFF = 30
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+RETRY_METHODS = ('get', 'put', 'delete', 'head', 'options')
+
+# request bodies, see axsemantics.encoding: compression ('gzip', 'deflate' or
+# None) for JSON bodies of at least REQUEST_COMPRESSION_MIN_SIZE bytes, only
+# if the API accepts it; STREAM_REQUESTS sends bodies with chunked transfer
+# encoding while they are encoded. ACCEPT_ENCODING is sent with every request.
+REQUEST_COMPRESSION = None
+REQUEST_COMPRESSION_MIN_SIZE = 1024
+STREAM_REQUESTS = False
+ACCEPT_ENCODING = 'gzip, deflate'
+
+# concurrent identical requests with these methods share a single HTTP call,
+# see axsemantics.coalesce.SingleFlight; off by default, as a caller joining
+# a request started before its own write finished gets the data from before
+# the write
+COALESCE_REQUESTS = False
+COALESCE_METHODS = ('get', 'head')
+
+# circuit breaker per API base, see axsemantics.retry.CircuitBreaker; set the
+# threshold to None to disable it
+CIRCUIT_BREAKER_THRESHOLD = 20
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+
+# client side rate limiting, see axsemantics.ratelimit: requests per second
+# (None disables it), burst size, whether the budget is shared per 'api_base'
+# or per 'token', and a directory for bucket files to share the budget
+# between processes
+RATE_LIMIT = None
+RATE_LIMIT_BURST = None
+RATE_LIMIT_SCOPE = 'api_base'
+RATE_LIMIT_DIRECTORY = None
+
+# list pagination: page size sent to the API (None uses the server default),
+# number of pages fetched ahead in the background ('all' fetches every page
+# concurrently) and the number of threads used for that
+LIST_PAGE_SIZE = None
+LIST_PREFETCH = 0
+LIST_PREFETCH_WORKERS = 4
+
+# polling for ContentProject.generate_all: initial and maximum seconds between
+# status checks, and the number of pending things above which the status is
+# checked by paging through the project, if that takes fewer requests than
+# refreshing every pending thing
+GENERATION_POLL_INTERVAL = 2
+GENERATION_POLL_MAX_INTERVAL = 60
+GENERATION_BATCH_THRESHOLD = 50
+
+# export, see axsemantics.export: page size and number of pages fetched ahead
+# while writing, and rows per parquet row group
+EXPORT_PAGE_SIZE = None
+EXPORT_PREFETCH = 4
+EXPORT_BATCH_SIZE = 10000
+
+# send only changed fields as PATCH in UpdateableMixin.save instead of a full PUT
+PARTIAL_SAVE = False
+
+# default number of worker threads for bulk operations, see axsemantics.bulk
+BULK_MAX_WORKERS = 8
+
+# function used to parse response bodies (bytes), e.g. orjson.loads; None
+# uses the json module
+JSON_LOADS = None
+
 DEBUG = False
@@ -0,0 +1,101 @@
+import json
+import time
+import zlib
+
+from axsemantics import constants
+
+
+# zlib window bits selecting the container format
+WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RequestBody:
+    # An encoded request body. size is the length of the JSON, encoded_size
+    # the number of bytes sent and encode_time the seconds spent encoding;
+    # for streamed bodies they are complete once the data has been sent.
+    __slots__ = ('data', 'headers', 'size', 'encoded_size', 'encode_time')
+
+    def __init__(self):
+        self.data = None
+        self.headers = {}
+        self.size = 0
+        self.encoded_size = 0
+        self.encode_time = 0
+
+
+def encode_body(params, compression=None, min_size=None, stream=None):
+    # Strings and bytes are sent as they are, everything else is encoded to
+    # JSON. If compression is 'gzip' or 'deflate', JSON of at least min_size
+    # bytes is compressed. With stream=True the JSON is encoded (and
+    # compressed) piece by piece while it is sent, using chunked transfer
+    # encoding, so the document never exists as a whole. That is slower
+    # than encoding it at once and only pays off for very large bodies.
+    body = RequestBody()
+    if params is None:
+        return body
+    if compression is None:
+        compression = constants.REQUEST_COMPRESSION
+    if min_size is None:
+        min_size = constants.REQUEST_COMPRESSION_MIN_SIZE
+    if stream is None:
+        stream = constants.STREAM_REQUESTS
+
+    if isinstance(params, (str, bytes)):
+        body.data = params.encode('utf-8') if isinstance(params, str) else params
+        body.size = body.encoded_size = len(body.data)
+        return body
+
+    if stream:
+        # the headers are sent before the size is known
+        if compression:
+            body.headers['Content-Encoding'] = compression
+        body.data = _encode(params, body, compression)
+        return body
+
+    started = time.perf_counter()
+    body.data = json.dumps(params, ensure_ascii=False).encode('utf-8')
+    body.size = len(body.data)
+    if compression and body.size >= min_size:
+        body.headers['Content-Encoding'] = compression
+        compressor = zlib.compressobj(wbits=WBITS[compression])
+        body.data = compressor.compress(body.data) + compressor.flush()
+    body.encoded_size = len(body.data)
+    body.encode_time = time.perf_counter() - started
+    return body
+
+
+def _encode(params, body, compression):
+    started = time.perf_counter()
+    compressor = zlib.compressobj(wbits=WBITS[compression]) if compression else None
+    buffer = []
+    buffered = 0
+
+    for piece in json.JSONEncoder(ensure_ascii=False).iterencode(params):
+        piece = piece.encode('utf-8')
+        body.size += len(piece)
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered < CHUNK_SIZE:
+            continue
+
+        data = b''.join(buffer)
+        buffer, buffered = [], 0
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            body.encoded_size += len(data)
+            body.encode_time += time.perf_counter() - started
+            yield data
+            started = time.perf_counter()
+
+    data = b''.join(buffer)
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    body.encoded_size += len(data)
+    body.encode_time += time.perf_counter() - started
+    yield data
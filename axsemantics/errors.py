@@ -8,7 +8,7 @@ class AXSemanticsError(Exception):
 
 class APIConnectionError(AXSemanticsError):
     def __str__(self):
-        if self.request:
+        if self.request is not None:
             return 'Could not connect to {}.'.format(
                 self.request.request.url,
             )
@@ -16,9 +16,14 @@ class APIConnectionError(AXSemanticsError):
         return self.message or '<no further information'
 
 
+class CircuitOpenError(APIConnectionError):
+    def __str__(self):
+        return self.message or 'Circuit breaker is open.'
+
+
 class APIError(AXSemanticsError):
     def __str__(self):
-        if self.request:
+        if self.request is not None:
             return 'Got status code {} in answer to a {} request to {}.'.format(
                 self.request.status_code,
                 self.request.request.method,
@@ -30,7 +35,7 @@ class APIError(AXSemanticsError):
 
 class AuthenticationError(AXSemanticsError):
     def __str__(self):
-        if self.request:
+        if self.request is not None:
             return 'Failed to authenticate against {}.'.format(
                 self.request.request.url
             )
@@ -0,0 +1,165 @@
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+
+from axsemantics import constants
+
+
+OPENERS = {
+    None: io.open,
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+}
+
+FORMATS = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+}
+
+
+def export_things(content_project, path, format=None, compression=None, fields=None,
+                  page_size=None, prefetch=None, schema=None):
+    # Streams all things of a content project to a file, page by page, and
+    # returns the number of things written. Format and compression are taken
+    # from the file name unless given. schema is an optional pyarrow schema
+    # for parquet, see write_parquet.
+    guessed_format, guessed_compression = guess_format(path)
+    format = format or guessed_format
+    compression = compression or guessed_compression
+    if format not in ('ndjson', 'csv', 'parquet'):
+        raise ValueError('Unknown export format {}.'.format(format))
+
+    with content_project.things(
+        page_size=page_size or constants.EXPORT_PAGE_SIZE,
+        prefetch=constants.EXPORT_PREFETCH if prefetch is None else prefetch,
+        compact=True,
+    ) as things:
+        rows = (_select(thing, fields) for thing in things)
+
+        if format == 'parquet':
+            return write_parquet(rows, path, compression, schema)
+
+        with OPENERS[compression](path, 'wt', encoding='utf-8', newline='') as f:
+            if format == 'csv':
+                return write_csv(rows, f, fields)
+            return write_ndjson(rows, f)
+
+
+def guess_format(path):
+    name = str(path).lower()
+    compression = None
+    for extension, value in EXTENSIONS.items():
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+            compression = value
+    for extension, value in FORMATS.items():
+        if name.endswith(extension):
+            return value, compression
+    return 'ndjson', compression
+
+
+def write_ndjson(rows, f):
+    count = 0
+    for row in rows:
+        f.write(json.dumps(row))
+        f.write('\n')
+        count += 1
+    return count
+
+
+def write_csv(rows, f, fields=None):
+    # without explicit fields the columns are taken from the first row, and
+    # a later row with other fields is an error rather than losing them;
+    # nested values are written as JSON
+    writer = None
+    count = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(f, fieldnames=fields or list(row), extrasaction='ignore')
+            writer.writeheader()
+        extra = None if fields else set(row) - set(writer.fieldnames)
+        if extra:
+            raise ValueError(
+                'Row {} has fields missing from the first row: {}. Pass fields to export to CSV.'.format(
+                    count + 1, ', '.join(sorted(map(str, extra))))
+            )
+        writer.writerow({key: _flatten(value) for key, value in row.items()})
+        count += 1
+    return count
+
+
+def write_parquet(rows, path, compression=None, schema=None):
+    # Without a schema the columns and their types are taken from the first
+    # batch; like for CSV, columns that cannot be typed from it or only
+    # appear later are an error rather than being lost.
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Exporting to parquet requires pyarrow to be installed.') from None
+
+    writer = None
+    count = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append({key: _flatten(value) for key, value in row.items()})
+            if len(batch) >= constants.EXPORT_BATCH_SIZE:
+                writer = _write_parquet_batch(pyarrow, writer, batch, path, compression, schema, count)
+                count += len(batch)
+                batch = []
+        if batch or writer is None:
+            writer = _write_parquet_batch(pyarrow, writer, batch, path, compression, schema, count)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def _write_parquet_batch(pyarrow, writer, batch, path, compression, schema, count):
+    if writer is None:
+        table = pyarrow.Table.from_pylist(batch, schema=schema)
+        if schema is None and batch:
+            untyped = [field.name for field in table.schema if pyarrow.types.is_null(field.type)]
+            if untyped:
+                raise ValueError(
+                    'Fields {} are empty in rows 1 to {}, so their type is unknown. '
+                    'Pass a schema to export to Parquet.'.format(', '.join(untyped), len(batch))
+                )
+        writer = pyarrow.parquet.ParquetWriter(path, table.schema, compression=compression or 'snappy')
+    else:
+        if schema is None:
+            extra = set().union(*batch) - set(writer.schema.names)
+            if extra:
+                raise ValueError(
+                    'Rows {} to {} have fields missing from the first batch: {}. Pass a schema to export '
+                    'to Parquet.'.format(count + 1, count + len(batch), ', '.join(sorted(map(str, extra))))
+                )
+        table = pyarrow.Table.from_pylist(batch, schema=writer.schema)
+    writer.write_table(table)
+    return writer
+
+
+def _select(thing, fields):
+    if fields:
+        return {field: thing.get(field) for field in fields}
+    return thing.to_dict()
+
+
+def _flatten(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
@@ -0,0 +1,308 @@
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+# Registered hooks. Request handlers only build events while this list is
+# non-empty, so instrumentation costs a single truth test when unused.
+hooks = []
+
+ID_PATTERN = re.compile(r'/\d+(?=/|$)')
+
+
+def add_hook(hook):
+    hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    hooks.remove(hook)
+
+
+def endpoint(url):
+    return ID_PATTERN.sub('/{id}', urlsplit(url).path)
+
+
+class RequestEvent:
+    # bytes_sent and bytes_received_wire count bytes on the wire, i.e.
+    # compressed, bytes_encoded and bytes_received the JSON documents
+    __slots__ = (
+        'method', 'url', 'endpoint', 'attempt', 'status_code', 'error',
+        'started', 'elapsed', 'bytes_sent', 'bytes_received',
+        'bytes_encoded', 'encode_time', 'bytes_received_wire',
+    )
+
+    def __init__(self, method, url, attempt=1):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint(url)
+        self.attempt = attempt
+        self.status_code = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.bytes_encoded = 0
+        self.encode_time = 0
+        self.bytes_received_wire = 0
+
+
+def start_request(method, url, attempt=1):
+    event = RequestEvent(method, url, attempt)
+    for hook in hooks:
+        hook.before_request(event)
+    return event
+
+
+def finish_request(event, result=None, error=None, body=None):
+    event.elapsed = time.perf_counter() - event.started
+    event.error = error
+    if body is not None:
+        event.bytes_sent = body.encoded_size
+        event.bytes_encoded = body.size
+        event.encode_time = body.encode_time
+    response = result if result is not None else getattr(error, 'request', None)
+    if response is not None:
+        event.status_code = response.status_code
+        event.bytes_received = len(response.content or b'')
+        event.bytes_received_wire = wire_size(response, event.bytes_received)
+    for hook in hooks:
+        hook.after_request(event)
+
+
+def wire_size(response, default):
+    # urllib3 counts the bytes read before decompression, otherwise the
+    # Content-Length of a compressed response is used
+    raw = getattr(response, 'raw', None)
+    if raw is not None and hasattr(raw, 'tell'):
+        try:
+            return raw.tell()
+        except (AttributeError, OSError, ValueError):
+            pass
+    length = response.headers.get('Content-Length')
+    if length and response.headers.get('Content-Encoding'):
+        return int(length)
+    return default
+
+
+def retry(method, url, attempt, error, delay):
+    for hook in hooks:
+        hook.on_retry(method, url, attempt, error, delay)
+
+
+def page(url, page, items):
+    for hook in hooks:
+        hook.on_page(url, page, items)
+
+
+def coalesced(method, url):
+    for hook in hooks:
+        hook.on_coalesced(method, url)
+
+
+class Hook:
+    def before_request(self, event):
+        pass
+
+    def after_request(self, event):
+        pass
+
+    def on_retry(self, method, url, attempt, error, delay):
+        pass
+
+    def on_page(self, url, page, items):
+        pass
+
+    def on_coalesced(self, method, url):
+        pass
+
+
+class LoggingHook(Hook):
+    def __init__(self, logger=None, level=logging.DEBUG, error_level=logging.WARNING):
+        self.logger = logger or logging.getLogger('axsemantics')
+        self.level = level
+        self.error_level = error_level
+
+    def after_request(self, event):
+        level = self.error_level if event.error else self.level
+        if self.logger.isEnabledFor(level):
+            self.logger.log(
+                level, '%s %s -> %s in %.1f ms (%d bytes sent, %d bytes received)',
+                event.method.upper(), event.url, event.status_code or type(event.error).__name__,
+                event.elapsed * 1000, event.bytes_sent, event.bytes_received,
+            )
+
+    def on_retry(self, method, url, attempt, error, delay):
+        self.logger.log(
+            self.error_level, 'Retrying %s %s after attempt %d in %.2f s: %s',
+            method.upper(), url, attempt, delay, error,
+        )
+
+
+class Histogram:
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsHook(Hook):
+    # Collects latency histograms per method and endpoint plus counters in
+    # memory. render() returns them in the Prometheus text format.
+    def __init__(self, buckets=None, prefix='axsemantics'):
+        self.buckets = buckets
+        self.prefix = prefix
+        self.latency = defaultdict(lambda: Histogram(self.buckets))
+        self.requests = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.bytes_sent = defaultdict(int)
+        self.bytes_received = defaultdict(int)
+        self.bytes_encoded = defaultdict(int)
+        self.bytes_received_wire = defaultdict(int)
+        self.encode_time = defaultdict(float)
+        self.pages = defaultdict(int)
+        self.coalesced = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def after_request(self, event):
+        key = (event.method, event.endpoint)
+        with self._lock:
+            self.latency[key].observe(event.elapsed)
+            self.requests[key + (str(event.status_code),)] += 1
+            self.bytes_sent[key] += event.bytes_sent
+            self.bytes_received[key] += event.bytes_received
+            self.bytes_encoded[key] += event.bytes_encoded
+            self.bytes_received_wire[key] += event.bytes_received_wire
+            self.encode_time[key] += event.encode_time
+            if event.error is not None:
+                self.errors[key + (type(event.error).__name__,)] += 1
+
+    def on_retry(self, method, url, attempt, error, delay):
+        with self._lock:
+            self.retries[(method, endpoint(url))] += 1
+
+    def on_page(self, url, page, items):
+        with self._lock:
+            self.pages[endpoint(url)] += 1
+
+    def on_coalesced(self, method, url):
+        with self._lock:
+            self.coalesced[(method, endpoint(url))] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._render_histograms(lines)
+            self._render_counter(lines, 'requests_total', ('method', 'endpoint', 'status'), self.requests)
+            self._render_counter(lines, 'errors_total', ('method', 'endpoint', 'error'), self.errors)
+            self._render_counter(lines, 'retries_total', ('method', 'endpoint'), self.retries)
+            self._render_counter(lines, 'sent_bytes_total', ('method', 'endpoint'), self.bytes_sent)
+            self._render_counter(lines, 'received_bytes_total', ('method', 'endpoint'), self.bytes_received)
+            self._render_counter(lines, 'encoded_bytes_total', ('method', 'endpoint'), self.bytes_encoded)
+            self._render_counter(lines, 'received_wire_bytes_total', ('method', 'endpoint'), self.bytes_received_wire)
+            self._render_counter(lines, 'encode_seconds_total', ('method', 'endpoint'), self.encode_time)
+            self._render_counter(lines, 'pages_total', ('endpoint',), {(key,): value for key, value in self.pages.items()})
+            self._render_counter(lines, 'coalesced_total', ('method', 'endpoint'), self.coalesced)
+        return '\n'.join(lines) + '\n'
+
+    def _render_histograms(self, lines):
+        name = '{}_request_duration_seconds'.format(self.prefix)
+        lines.append('# TYPE {} histogram'.format(name))
+        for (method, path), histogram in sorted(self.latency.items()):
+            labels = 'method="{}",endpoint="{}"'.format(method, path)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, cumulative))
+            lines.append('{}_sum{{{}}} {}'.format(name, labels, histogram.sum))
+            lines.append('{}_count{{{}}} {}'.format(name, labels, histogram.count))
+
+    def _render_counter(self, lines, suffix, label_names, values):
+        name = '{}_{}'.format(self.prefix, suffix)
+        lines.append('# TYPE {} counter'.format(name))
+        for key, value in sorted(values.items()):
+            labels = ','.join('{}="{}"'.format(label, part) for label, part in zip(label_names, key))
+            lines.append('{}{{{}}} {}'.format(name, labels, value))
+
+
+class PrometheusHook(Hook):
+    # Reports into prometheus_client metrics, for use with its exporters.
+    def __init__(self, registry=None, prefix='axsemantics'):
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError('PrometheusHook requires prometheus_client to be installed.') from None
+
+        kwargs = {'registry': registry} if registry is not None else {}
+        self.latency = prometheus_client.Histogram(
+            '{}_request_duration_seconds'.format(prefix), 'Duration of API requests',
+            ['method', 'endpoint'], **kwargs
+        )
+        self.requests = prometheus_client.Counter(
+            '{}_requests_total'.format(prefix), 'API requests',
+            ['method', 'endpoint', 'status'], **kwargs
+        )
+        self.retries = prometheus_client.Counter(
+            '{}_retries_total'.format(prefix), 'Retried API requests',
+            ['method', 'endpoint'], **kwargs
+        )
+        self.bytes_sent = prometheus_client.Counter(
+            '{}_sent_bytes_total'.format(prefix), 'Request body bytes',
+            ['method', 'endpoint'], **kwargs
+        )
+        self.bytes_received = prometheus_client.Counter(
+            '{}_received_bytes_total'.format(prefix), 'Response body bytes',
+            ['method', 'endpoint'], **kwargs
+        )
+        self.bytes_encoded = prometheus_client.Counter(
+            '{}_encoded_bytes_total'.format(prefix), 'Request body bytes before compression',
+            ['method', 'endpoint'], **kwargs
+        )
+        self.bytes_received_wire = prometheus_client.Counter(
+            '{}_received_wire_bytes_total'.format(prefix), 'Response body bytes before decompression',
+            ['method', 'endpoint'], **kwargs
+        )
+        self.encode_time = prometheus_client.Counter(
+            '{}_encode_seconds_total'.format(prefix), 'Time spent encoding request bodies',
+            ['method', 'endpoint'], **kwargs
+        )
+        self.pages = prometheus_client.Counter(
+            '{}_pages_total'.format(prefix), 'List pages fetched',
+            ['endpoint'], **kwargs
+        )
+        self.coalesced = prometheus_client.Counter(
+            '{}_coalesced_total'.format(prefix), 'Requests that shared the response of an identical one',
+            ['method', 'endpoint'], **kwargs
+        )
+
+    def after_request(self, event):
+        self.latency.labels(event.method, event.endpoint).observe(event.elapsed)
+        self.requests.labels(event.method, event.endpoint, str(event.status_code or 'error')).inc()
+        self.bytes_sent.labels(event.method, event.endpoint).inc(event.bytes_sent)
+        self.bytes_received.labels(event.method, event.endpoint).inc(event.bytes_received)
+        self.bytes_encoded.labels(event.method, event.endpoint).inc(event.bytes_encoded)
+        self.bytes_received_wire.labels(event.method, event.endpoint).inc(event.bytes_received_wire)
+        self.encode_time.labels(event.method, event.endpoint).inc(event.encode_time)
+
+    def on_retry(self, method, url, attempt, error, delay):
+        self.retries.labels(method, endpoint(url)).inc()
+
+    def on_page(self, url, page, items):
+        self.pages.labels(endpoint(url)).inc()
+
+    def on_coalesced(self, method, url):
+        self.coalesced.labels(method, endpoint(url)).inc()
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import namedtuple
+
+
+JournalEntry = namedtuple('JournalEntry', ['uid', 'id', 'hash'])
+
+
+def content_hash(data):
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class ImportJournal:
+    # Append-only record of the things an import has already sent, keyed by
+    # uid. Every entry is committed right away, so a crashed run can be
+    # resumed without creating duplicates.
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS things (uid TEXT PRIMARY KEY, id INTEGER, hash TEXT)'
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, uid):
+        return self.get(uid) is not None
+
+    def get(self, uid):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT uid, id, hash FROM things WHERE uid = ?', (str(uid),)
+            ).fetchone()
+        return JournalEntry(*row) if row else None
+
+    def is_empty(self):
+        with self._lock:
+            return self._connection.execute('SELECT 1 FROM things LIMIT 1').fetchone() is None
+
+    def record(self, uid, id, hash):
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO things (uid, id, hash) VALUES (?, ?, ?)',
+                (str(uid), id, hash),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,126 @@
+import json
+import sqlite3
+import threading
+
+from axsemantics import constants
+from axsemantics.records import Record
+
+
+class ProjectMirror:
+    # Local SQLite copy of the things of a content project, indexed by id and
+    # uid. sync() only fetches things modified since the last sync by listing
+    # them newest first; deletions on the server are only picked up by a
+    # full sync.
+    modified_field = 'modified'
+    ordering_param = 'ordering'
+
+    def __init__(self, content_project, path):
+        self.content_project = content_project
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS things '
+                '(id INTEGER PRIMARY KEY, uid TEXT, modified TEXT, data TEXT, generation INTEGER)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS things_uid ON things (uid)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        return self.filter()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM things').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @property
+    def last_modified(self):
+        return self._get_meta('last_modified')
+
+    def sync(self, full=False, page_size=None, prefetch=None):
+        last_modified = None if full else self.last_modified
+        generation = int(self._get_meta('generation') or 0) + 1
+        things = self.content_project.things(
+            page_size=page_size, prefetch=prefetch, compact=True,
+            params={self.ordering_param: '-{}'.format(self.modified_field)},
+        )
+
+        count = 0
+        newest = last_modified
+        rows = []
+        for thing in things:
+            modified = thing.get(self.modified_field)
+            if last_modified and modified and modified < last_modified:
+                things.close()
+                break
+            if modified and (newest is None or modified > newest):
+                newest = modified
+            rows.append((thing['id'], thing.get('uid'), modified, json.dumps(thing.to_dict()), generation))
+            if len(rows) >= 500:
+                count += self._store(rows)
+                rows = []
+        count += self._store(rows)
+
+        with self._lock, self._connection:
+            if last_modified is None:
+                self._connection.execute('DELETE FROM things WHERE generation != ?', (generation,))
+            self._set_meta('generation', generation)
+            if newest:
+                self._set_meta('last_modified', newest)
+        return count
+
+    def get(self, **kwargs):
+        return next(self.filter(**kwargs), None)
+
+    def filter(self, **kwargs):
+        query, params = 'SELECT data FROM things', ()
+        if 'id' in kwargs:
+            query, params = query + ' WHERE id = ?', (kwargs['id'],)
+        elif 'uid' in kwargs:
+            query, params = query + ' WHERE uid = ?', (str(kwargs['uid']),)
+
+        cursor = self._connection.execute(query + ' ORDER BY id', params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(500)
+            if not rows:
+                return
+            for row, in rows:
+                data = json.loads(row)
+                if all(data.get(key) == value for key, value in kwargs.items()):
+                    yield self._record(data)
+
+    def _record(self, data):
+        return Record(
+            data, 'thing', self.content_project.api_token,
+            self.content_project.api_base or constants.API_BASE,
+            {'cp_id': self.content_project['id']}, self.content_project.client,
+        )
+
+    def _store(self, rows):
+        if rows:
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO things (id, uid, modified, data, generation) VALUES (?, ?, ?, ?, ?)',
+                    rows,
+                )
+        return len(rows)
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
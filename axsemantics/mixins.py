@@ -1,5 +1,4 @@
-import json
-
+from axsemantics import constants
 from axsemantics.base import ListResource
 
 
@@ -8,6 +7,14 @@ class CreateableMixin:
         params = {key: self[key] for key in self.required_fields}
         params.update(self.serialize(None))
         self.load_data(self.request('post', self.instance_url(), params=params))
+        self.invalidate_cache()
+        return self
+
+    async def acreate(self, api_token=None, api_base=None, **params):
+        params = {key: self[key] for key in self.required_fields}
+        params.update(self.serialize(None))
+        self.load_data(await self.arequest('post', self.instance_url(), params=params))
+        self.invalidate_cache()
         return self
 
 
@@ -18,33 +25,68 @@ class UpdateableMixin:
 
     def __init__(self, *args, **kwargs):
         super(UpdateableMixin, self).__init__(*args, **kwargs)
-        self.update(kwargs)
+        self.update({
+            key: value for key, value in kwargs.items()
+            if key not in ('api_token', 'api_base', 'client')
+        })
         for key in self.required_fields:
             if not key in kwargs:
                 self[key] = None
 
-    def save(self):
-        # these would be the params for PATCH
-        # params = {key: self[key] for key in self.required_fields}
-        # params.update(self.serialize(None))
-        params = json.dumps(self)
-        self.load_data(self.request('put', self.instance_url(), params))
+    def save(self, partial=None):
+        method, params = self._save_params(partial)
+        if method:
+            self.load_data(self.request(method, self.instance_url(), params))
+            self.invalidate_cache()
         return self
 
+    async def asave(self, partial=None):
+        method, params = self._save_params(partial)
+        if method:
+            self.load_data(await self.arequest(method, self.instance_url(), params))
+            self.invalidate_cache()
+        return self
+
+    def _save_params(self, partial):
+        if partial is None:
+            partial = constants.PARTIAL_SAVE
+        if not partial:
+            return 'put', dict(self)
+
+        params = self.dirty_fields()
+        if not params:
+            return None, None
+        return 'patch', params
+
 
 class DeleteableMixin:
     def delete(self, params=None):
+        self.invalidate_cache()
         self.load_data(self.request('delete', self.instance_url(), params))
         return self
 
+    async def adelete(self, params=None):
+        self.invalidate_cache()
+        self.load_data(await self.arequest('delete', self.instance_url(), params))
+        return self
+
 
 class ListableMixin:
     list_class = None
 
     @classmethod
-    def all(cls):
+    def all(cls, page_size=None, prefetch=None, compact=False, client=None):
+        if not cls.list_class:
+            return ListResource(initial_url=cls.class_url(), class_name=cls.class_name,
+                                page_size=page_size, prefetch=prefetch, compact=compact, client=client)
+        return cls.list_class
+
+    @classmethod
+    def aall(cls, page_size=None, prefetch=None, compact=False, client=None):
         if not cls.list_class:
-            return ListResource(initial_url=cls.class_url(), class_name=cls.class_name)
+            return ListResource(initial_url=cls.class_url(), class_name=cls.class_name,
+                                page_size=page_size, prefetch=prefetch, compact=compact, fetch=False,
+                                client=client)
         return cls.list_class
 
 
@@ -52,3 +94,7 @@ class ContentGenerationMixin:
     def generate_content(self, force=False, params=None):
         url = '{}generate_content/?force={}'.format(self.instance_url(), str(force).lower())
         return self.request('post', url, params)
+
+    async def agenerate_content(self, force=False, params=None):
+        url = '{}generate_content/?force={}'.format(self.instance_url(), str(force).lower())
+        return await self.arequest('post', url, params)
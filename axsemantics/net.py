@@ -1,22 +1,287 @@
+import threading
 import time
+from urllib.parse import urlencode
 
-import requests
-
-from axsemantics import constants
+from axsemantics import (
+    constants,
+    instrumentation,
+)
+from axsemantics.auth import get_authenticator
+from axsemantics.coalesce import default_single_flight
+from axsemantics.encoding import encode_body
 from axsemantics.errors import (
     APIConnectionError,
     APIError,
 )
+from axsemantics.ratelimit import get_rate_limiter
+from axsemantics.retry import (
+    RetryPolicy,
+    get_circuit_breaker,
+)
+
+
+requests = None
+
+
+def load_requests():
+    # requests makes up most of the import time of this package, so it is
+    # only loaded once the first session is needed
+    global requests
+    if requests is None:
+        import requests
+    return requests
+
+
+class SessionPool:
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=None,
+                 max_retries=None, keep_alive=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.max_retries = max_retries
+        self.keep_alive = keep_alive
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, api_base=None, token=None):
+        key = (api_base or constants.API_BASE, token)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self.create_session(token)
+        return session
+
+    def create_session(self, token=None):
+        requests = load_requests()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self._setting('pool_connections', 'POOL_CONNECTIONS'),
+            pool_maxsize=self._setting('pool_maxsize', 'POOL_MAXSIZE'),
+            pool_block=self._setting('pool_block', 'POOL_BLOCK'),
+            max_retries=self._setting('max_retries', 'POOL_MAX_RETRIES'),
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'User-Agent': 'AXSemantics Python Client',
+            'Connection': 'keep-alive' if self._setting('keep_alive', 'KEEP_ALIVE') else 'close',
+        })
+        if token:
+            session.headers['Authorization'] = 'Token {}'.format(token)
+        return session
+
+    def close(self, api_base=None, token=None):
+        with self._lock:
+            if api_base or token:
+                keys = [(api_base or constants.API_BASE, token)]
+            else:
+                keys = list(self._sessions)
+            sessions = [self._sessions.pop(key) for key in keys if key in self._sessions]
+        for session in sessions:
+            session.close()
+
+    def _setting(self, attribute, constant):
+        value = getattr(self, attribute)
+        return getattr(constants, constant) if value is None else value
+
+
+default_pool = SessionPool()
+
+# API bases that rejected a compressed request body
+uncompressed_bases = set()
+
+# steps of RequestHandler.recover() besides waiting and retrying
+REAUTHENTICATE = object()
+RESEND = object()
+
+
+def close_sessions():
+    default_pool.close()
 
 
 class RequestHandler:
-    def __init__(self, token=None, api_base=None):
-        self.base = api_base or constants.API_BASE
+    def __init__(self, token=None, api_base=None, pool=None, retry=None, rate_limiter=None, client=None,
+                 single_flight=None):
+        # Settings not given explicitly come from the client, if any, and
+        # from axsemantics.constants otherwise. The global token is never
+        # used for requests made on behalf of a client. Requests with the
+        # token of a client or the global one log in again once if the
+        # token is rejected, see axsemantics.auth; so do requests given a
+        # copy of the global token.
+        self.base = api_base or (client.api_base if client is not None else constants.API_BASE)
+        self.authenticator = None
+        if client is not None:
+            if token is None:
+                token = client.api_token
+                self.authenticator = client.authenticator
+            pool = pool or client.pool
+            retry = retry or client.retry
+            rate_limiter = rate_limiter or client.rate_limiter
+        elif token is None or (token and token == constants.API_TOKEN):
+            token = constants.API_TOKEN
+            self.authenticator = get_authenticator(self.base)
+        self.client = client
         self.token = token
+        self.pool = pool or default_pool
+        self.retry = retry or RetryPolicy()
+        self.circuit_breaker = get_circuit_breaker(self.base)
+        self.rate_limiter = rate_limiter or get_rate_limiter(self.base, self.token)
+        if single_flight is None and constants.COALESCE_REQUESTS:
+            single_flight = default_single_flight
+        self.single_flight = single_flight
+
+    @property
+    def session(self):
+        return self.pool.get(self.base, self.token)
 
     def request(self, method, url, params, user_headers=None):
+        return self.decode(self.send(method, url, params, user_headers))
+
+    def send(self, method, url, params, user_headers=None):
+        url, headers = self.prepare(method, url, params, user_headers)
+        if self.single_flight is None or method not in constants.COALESCE_METHODS:
+            return self.transmit(method, url, headers, params)
+
+        def transmit():
+            result = self.transmit(method, url, headers, params)
+            # read the body before the response is shared between threads
+            result.content
+            return result
+
+        return self.single_flight.do(self.flight_key(method, url, headers), transmit, self.joined(method, url))
+
+    def flight_key(self, method, url, headers):
+        # the headers carry the token and any revalidation headers
+        return (method, url, tuple(sorted(headers.items())))
+
+    def joined(self, method, url):
+        if instrumentation.hooks:
+            return lambda: instrumentation.coalesced(method, url)
+
+    def transmit(self, method, url, headers, params):
+        attempt = 1
+        reauthenticated = False
+        while True:
+            try:
+                return self.attempt(method, url, headers, params, attempt)
+            except (APIConnectionError, APIError) as error:
+                step = self.recover(method, url, attempt, error, reauthenticated)
+                if step is None:
+                    raise
+            if step is REAUTHENTICATE:
+                reauthenticated = True
+                headers = self.reauthenticate(self.authenticator.refresh(self.token), headers)
+            elif step is not RESEND:
+                time.sleep(step)
+                attempt += 1
+
+    def attempt(self, method, url, headers, params, attempt=1):
+        body = self.begin_attempt(method, params)
+        event = None
+        try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            event = instrumentation.start_request(method, url, attempt) if instrumentation.hooks else None
+            result = self.request_and_raise(method, url, headers, body)
+        except BaseException as error:
+            self.end_attempt(event, body, error=error)
+            raise
+        self.end_attempt(event, body, result)
+        return result
+
+    # The decisions of transmit() and attempt() live in the helpers below,
+    # which AsyncRequestHandler shares; only the I/O and waiting differ.
+
+    def recover(self, method, url, attempt, error, reauthenticated):
+        # What to do after a failed attempt: REAUTHENTICATE, RESEND right
+        # away, the seconds to wait before the next attempt, or None to give
+        # up and raise the error.
+        if not reauthenticated and self.should_reauthenticate(error):
+            return REAUTHENTICATE
+        if self.should_decompress(error):
+            uncompressed_bases.add(self.base)
+            return RESEND
+        if not self.retry.should_retry(method, attempt, error):
+            return None
+        delay = self.retry.delay(attempt, error)
+        if instrumentation.hooks:
+            instrumentation.retry(method, url, attempt, error, delay)
+        if constants.DEBUG:
+            print('Request failed, sleeping for {:.2f} seconds and retrying ...'.format(delay))
+        return delay
+
+    def begin_attempt(self, method, params):
+        # the body is encoded first, so that an unencodable one does not
+        # take the trial request of a half-open circuit
+        body = self.encode_body(method, params)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request()
+        return body
+
+    def end_attempt(self, event, body, result=None, error=None):
+        # Records the outcome with the instrumentation hooks and the circuit
+        # breaker. Exceptions other than API errors, e.g. a cancelled task,
+        # count as failures, so that a trial request cannot keep the circuit
+        # open for good.
+        breaker = self.circuit_breaker
+        if error is None:
+            if event is not None:
+                instrumentation.finish_request(event, result, body=body)
+            if breaker is not None:
+                breaker.record_success()
+        elif isinstance(error, (APIConnectionError, APIError)):
+            if event is not None:
+                instrumentation.finish_request(event, error=error, body=body)
+            if breaker is not None:
+                if self.retry.is_retryable(error):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+        elif breaker is not None:
+            breaker.record_failure()
+
+    def encode_body(self, method, params):
+        if method not in ('post', 'put', 'patch') or params is None:
+            return None
+        compression = False if self.base in uncompressed_bases else constants.REQUEST_COMPRESSION
+        return encode_body(params, compression=compression)
+
+    def should_decompress(self, error):
+        # an API answering 415 to a compressed body gets uncompressed ones
+        request = getattr(error, 'request', None)
+        return (
+            constants.REQUEST_COMPRESSION and self.base not in uncompressed_bases
+            and request is not None and request.status_code == 415
+        )
+
+    def should_reauthenticate(self, error):
+        request = getattr(error, 'request', None)
+        return self.authenticator is not None and request is not None and request.status_code == 401
+
+    def reauthenticate(self, token, headers):
+        self.token = token
+        if self.client is not None:
+            self.client.api_token = token
+        else:
+            constants.API_TOKEN = token
+        return dict(headers, Authorization='Token {}'.format(token))
+
+    def decode(self, result):
+        if not result.content:
+            return None
+        if constants.JSON_LOADS:
+            return constants.JSON_LOADS(result.content)
+        return result.json()
+
+    def prepare(self, method, url, params, user_headers=None):
         url = '{}{}'.format(self.base, url)
-        token = self.token or constants.API_TOKEN
+        token = self.token
 
         if method in ('get', 'delete') and params:
             url += self.encode_params(params)
@@ -24,6 +289,7 @@ class RequestHandler:
         headers = {
             'User-Agent': 'AXSemantics Python Client',
             'Content-Type': 'application/json',
+            'Accept-Encoding': constants.ACCEPT_ENCODING,
         }
 
         if token:
@@ -35,23 +301,17 @@ class RequestHandler:
         if constants.DEBUG:
             print('Sending {} request to {}.'.format(method, url))
 
-        try:
-            result = self.request_and_raise(method, url, headers, params)
-        except APIConnectionError:
-            if constants.DEBUG:
-                print('Request failed, sleeping for 5 seconds and retrying ...')
-            time.sleep(5)
-            result = self.request_and_raise(method, url, headers, params)
-        return result.json()
+        return url, headers
 
-    def request_and_raise(self, method, url, headers, params):
+    def request_and_raise(self, method, url, headers, body=None):
+        requests = load_requests()
         try:
-            if method == 'post':
-                result = requests.post(url, headers=headers, json=params, timeout=5)
-            elif method == 'put':
-                result = requests.put(url, headers=headers, data=params, timeout=5)
+            session = self.session
+            if body is not None:
+                headers = dict(headers, **body.headers)
+                result = session.request(method, url, headers=headers, data=body.data, timeout=5)
             else:
-                result = requests.request(method, url, headers=headers, timeout=5)
+                result = session.request(method, url, headers=headers, timeout=5)
 
             result.raise_for_status()
             return result
@@ -72,7 +332,4 @@ class RequestHandler:
             return '?' + '&'.join(self._dict_encode(d) for d in params)
 
     def _dict_encode(self, data):
-        return '&'.join(
-            '{}={}'.format(key, value)
-            for key, value in data.items()
-        )
+        return urlencode(data)
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+from axsemantics import constants
+
+
+class TokenBucket:
+    # Thread-safe token bucket. Callers that find the bucket empty reserve
+    # their token anyway and sleep until it has been refilled, so waiting
+    # callers are served in order instead of polling.
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = burst or max(int(rate), 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def reserve(self, tokens=1):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait = self._take(self._tokens, now - self._updated, tokens)
+            self._updated = now
+        return wait
+
+    def _take(self, available, elapsed, tokens):
+        available = min(self.burst, available + elapsed * self.rate) - tokens
+        return available, max(-available / self.rate, 0)
+
+
+class FileTokenBucket(TokenBucket):
+    # Token bucket whose state lives in a file guarded by an exclusive lock,
+    # so that all processes on a host using the same path share one budget.
+    def __init__(self, path, rate, burst=None):
+        super(FileTokenBucket, self).__init__(rate, burst)
+        import fcntl
+        self._fcntl = fcntl
+        self.path = path
+
+    def reserve(self, tokens=1):
+        with self._lock, open(self.path, 'a+') as f:
+            self._fcntl.flock(f, self._fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                state = f.read().split()
+                now = time.time()
+                if len(state) == 2:
+                    available, updated = float(state[0]), float(state[1])
+                else:
+                    available, updated = float(self.burst), now
+                available, wait = self._take(available, max(now - updated, 0), tokens)
+                f.seek(0)
+                f.truncate()
+                f.write('{!r} {!r}'.format(available, now))
+                f.flush()
+            finally:
+                self._fcntl.flock(f, self._fcntl.LOCK_UN)
+        return wait
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_base, token=None):
+    if not constants.RATE_LIMIT:
+        return None
+
+    key = api_base if constants.RATE_LIMIT_SCOPE == 'api_base' else (api_base, token)
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = _rate_limiters[key] = create_rate_limiter(key)
+    return limiter
+
+
+def create_rate_limiter(key):
+    if constants.RATE_LIMIT_DIRECTORY:
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        path = os.path.join(constants.RATE_LIMIT_DIRECTORY, 'axsemantics-{}.bucket'.format(name))
+        return FileTokenBucket(path, constants.RATE_LIMIT, constants.RATE_LIMIT_BURST)
+    return TokenBucket(constants.RATE_LIMIT, constants.RATE_LIMIT_BURST)
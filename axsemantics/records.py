@@ -0,0 +1,37 @@
+from collections.abc import Mapping
+
+from axsemantics.utils import create_object
+
+
+class Record(Mapping):
+    # Compact read-only view of a list item. The parsed response is kept as
+    # is, without wrapping nested values or keeping a snapshot for diffing.
+    # Use to_object() to get a full, mutable resource object.
+    __slots__ = ('_data', 'class_name', 'api_token', 'api_base', '_kwargs', 'client')
+
+    def __init__(self, data, class_name=None, api_token=None, api_base=None, kwargs=None, client=None):
+        self._data = data
+        self.class_name = class_name
+        self.api_token = api_token
+        self.api_base = api_base
+        self._kwargs = kwargs
+        self.client = client
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return 'Record({!r})'.format(self._data)
+
+    def to_dict(self):
+        return dict(self._data)
+
+    def to_object(self):
+        return create_object(self._data, api_token=self.api_token, _type=self.class_name, client=self.client,
+                             **(self._kwargs or {}))
@@ -1,8 +1,19 @@
+import time
+from collections.abc import Mapping
+
 from axsemantics import constants
 from axsemantics.base import (
     APIResource,
     ListResource,
 )
+from axsemantics.bulk import (
+    BulkResult,
+    bulk_map,
+)
+from axsemantics.errors import APIError
+from axsemantics.export import export_things
+from axsemantics.journal import content_hash
+from axsemantics.mirror import ProjectMirror
 from axsemantics.mixins import(
     ContentGenerationMixin,
     CreateableMixin,
@@ -10,24 +21,23 @@ from axsemantics.mixins import(
     ListableMixin,
     UpdateableMixin,
 )
-from axsemantics.utils import create_object
+from axsemantics.records import Record
+from axsemantics.sync import ThingSync
+from axsemantics.utils import register_type
+
+
+def content_ready(thing):
+    return bool(thing.get('generated_text_in_sync'))
 
 
 class ThingList(ListResource):
     class_name = 'thing'
+    filter_fields = ('uid',)
 
     def __init__(self, cp_id, *args, **kwargs):
         self.cp_id = cp_id
         super(ThingList, self).__init__(*args, **kwargs)
-
-    def __next__(self):
-        if self.current_index >= len(self.current_list):
-            if self.next_page:
-                self._update()
-            else:
-                raise StopIteration
-        self.current_index += 1
-        return create_object(self.current_list[self.current_index - 1], api_token=self.api_token, _type=self.class_name, cp_id=self.cp_id)
+        self._item_kwargs = {'cp_id': cp_id}
 
 
 class Thing(CreateableMixin, UpdateableMixin, DeleteableMixin, ListableMixin, ContentGenerationMixin, APIResource):
@@ -56,12 +66,191 @@ class ContentProject(CreateableMixin, DeleteableMixin, ListableMixin, ContentGen
     def __init__(self, api_token=None, **kwargs):
         super(ContentProject, self).__init__(api_token=api_token, **kwargs)
 
-    def things(self):
+    def things(self, page_size=None, prefetch=None, compact=False, params=None):
+        return self._thing_list(page_size=page_size, prefetch=prefetch, compact=compact, params=params)
+
+    def athings(self, page_size=None, prefetch=None, compact=False, params=None):
+        return self._thing_list(page_size=page_size, prefetch=prefetch, compact=compact, params=params,
+                                fetch=False)
+
+    def _thing_list(self, **kwargs):
         if self['id']:
             thing_url = '{}thing/'.format(self.instance_url())
-            return ThingList(cp_id=self['id'], api_token=self.api_token, class_name=self.class_name, initial_url=thing_url)
+            return ThingList(cp_id=self['id'], api_token=self.api_token, api_base=self.api_base, client=self.client,
+                             class_name=ThingList.class_name, initial_url=thing_url, **kwargs)
+
+    def mirror(self, path):
+        return ProjectMirror(self, path)
+
+    def export(self, path, format=None, compression=None, fields=None, schema=None):
+        return export_things(self, path, format=format, compression=compression, fields=fields, schema=schema)
+
+    def bulk_create_things(self, things, max_workers=None, max_pending=None):
+        return bulk_map(
+            lambda thing: self._bind_thing(thing).create(),
+            things, max_workers=max_workers, max_pending=max_pending,
+        )
+
+    def bulk_update_things(self, things, max_workers=None, max_pending=None):
+        return bulk_map(
+            lambda thing: self._bind_thing(thing).save(),
+            things, max_workers=max_workers, max_pending=max_pending,
+        )
+
+    def bulk_delete_things(self, things, max_workers=None, max_pending=None):
+        return bulk_map(
+            lambda thing: self._bind_thing(thing).delete(),
+            things, max_workers=max_workers, max_pending=max_pending,
+        )
+
+    def bulk_upsert_things(self, things, journal, max_workers=None, max_pending=None):
+        # Things whose uid was already sent with identical content are
+        # skipped and reported with neither result nor error. Uids missing
+        # from the journal are looked up on the server if the journal is
+        # empty, i.e. on a first run, or if creating them is rejected.
+        lookup = journal.is_empty()
+        return bulk_map(
+            lambda thing: self._upsert_thing(thing, journal, lookup),
+            things, max_workers=max_workers, max_pending=max_pending,
+        )
+
+    def sync_things(self, things, delete=False, page_size=None, prefetch=None):
+        # see axsemantics.sync.ThingSync: plan() for a dry run, apply() to
+        # send the changes
+        return ThingSync(self, things, delete=delete, page_size=page_size, prefetch=prefetch)
+
+    def _upsert_thing(self, thing, journal, lookup=False):
+        thing = self._bind_thing(thing)
+        data = {key: thing[key] for key in thing if key not in ('id', 'content_project')}
+        hash = content_hash(data)
+        entry = journal.get(thing['uid'])
+
+        if entry is not None and entry.hash == hash:
+            return None
+        if entry is not None:
+            id = entry.id
+        else:
+            id = self._find_thing_id(thing['uid']) if lookup else None
+
+        if id is None:
+            try:
+                thing.create()
+            except APIError as error:
+                # e.g. a crash between create() and record() in an earlier run
+                request = getattr(error, 'request', None)
+                if request is None or request.status_code != 400:
+                    raise
+                id = self._find_thing_id(thing['uid'])
+                if id is None:
+                    raise
+        if id is not None:
+            thing['id'] = id
+            thing.save()
+
+        journal.record(thing['uid'], thing['id'], hash)
+        return thing
+
+    def _find_thing_id(self, uid):
+        thing = self._thing_list(compact=True, prefetch=0, fetch=False).get(uid=uid)
+        return thing['id'] if thing is not None else None
+
+    def generate_all(self, things=None, max_concurrency=None, wait=True, force=False,
+                     is_ready=content_ready, timeout=None):
+        # Triggers content generation for the given things (all things of
+        # the project by default). With wait=True, every thing is yielded
+        # again once is_ready() says its content has been generated. Polling
+        # starts while generation is still being requested for later things;
+        # timeout counts from when the last request was sent.
+        if things is None:
+            things = self.things(prefetch=constants.LIST_PREFETCH or 1)
+        results = bulk_map(
+            lambda thing: self._generate_thing(thing, force),
+            things, max_workers=max_concurrency,
+        )
+        if not wait:
+            yield from results
+            return
+
+        pending = {}
+        interval = constants.GENERATION_POLL_INTERVAL
+        next_poll = time.monotonic() + interval
+        for item, thing, error in results:
+            if error:
+                yield BulkResult(item, thing, error)
+                continue
+            pending[thing['id']] = (item, thing)
+            if time.monotonic() >= next_poll:
+                ready = yield from self._yield_ready(pending, is_ready, max_concurrency)
+                interval = self._poll_interval(interval, ready)
+                next_poll = time.monotonic() + interval
+
+        deadline = timeout and time.monotonic() + timeout
+        while pending:
+            time.sleep(max(next_poll - time.monotonic(), 0))
+            ready = yield from self._yield_ready(pending, is_ready, max_concurrency)
+            interval = self._poll_interval(interval, ready)
+            next_poll = time.monotonic() + interval
+
+            if deadline and pending and next_poll > deadline:
+                for item, thing in pending.values():
+                    yield BulkResult(item, thing, APIError(message='Timed out waiting for generated content.'))
+                return
+
+    def _generate_thing(self, thing, force):
+        thing = self._bind_thing(thing)
+        thing.generate_content(force=force)
+        return thing
+
+    def _yield_ready(self, pending, is_ready, max_concurrency):
+        ready = [thing for thing in self._poll_things(pending, max_concurrency) if is_ready(thing)]
+        for thing in ready:
+            item, _ = pending.pop(thing['id'])
+            yield BulkResult(item, thing, None)
+        return bool(ready)
+
+    def _poll_interval(self, interval, ready):
+        if ready:
+            return constants.GENERATION_POLL_INTERVAL
+        return min(interval * 2, constants.GENERATION_POLL_MAX_INTERVAL)
+
+    def _poll_things(self, pending, max_concurrency=None):
+        # Pending things are refreshed one by one, unless there are many of
+        # them and paging through the project takes fewer requests.
+        if len(pending) > constants.GENERATION_BATCH_THRESHOLD:
+            things = self.things(prefetch=0)
+            if things._page_count() < len(pending):
+                things.prefetch = constants.LIST_PREFETCH or 1
+                return (thing for thing in things if thing['id'] in pending)
+            things.close()
+
+        def refresh(thing):
+            thing.invalidate_cache()
+            return thing.refresh()
+
+        results = bulk_map(refresh, [thing for _, thing in pending.values()], max_workers=max_concurrency)
+        return (thing for _, thing, error in results if error is None)
+
+    def _bind_thing(self, thing):
+        # things, records of compact lists, other mappings or ids
+        if isinstance(thing, Record):
+            thing = thing.to_object()
+        if isinstance(thing, Thing):
+            if thing['content_project'] is None:
+                thing['content_project'] = self['id']
+            return thing
+        if not isinstance(thing, Mapping):
+            thing = {'id': thing}
+        return Thing(cp_id=self['id'], api_token=self.api_token, api_base=self.api_base, client=self.client, **thing)
 
 
 class ContentProjectList(ListResource):
-    initial_url = ContentProject.class_url()
     class_name = 'content-project'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('class_name', self.class_name)
+        kwargs.setdefault('initial_url', ContentProject.class_url())
+        super(ContentProjectList, self).__init__(*args, **kwargs)
+
+
+register_type(Thing, Thing.class_name)
+register_type(ContentProject, ContentProject.class_name)
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from axsemantics import constants
+from axsemantics.errors import (
+    APIConnectionError,
+    APIError,
+    CircuitOpenError,
+)
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=None, backoff_factor=None, max_backoff=None, jitter=True,
+                 status_codes=None, methods=None, respect_retry_after=True):
+        self.max_attempts = max_attempts or constants.RETRY_MAX_ATTEMPTS
+        self.backoff_factor = constants.RETRY_BACKOFF_FACTOR if backoff_factor is None else backoff_factor
+        self.max_backoff = constants.RETRY_MAX_BACKOFF if max_backoff is None else max_backoff
+        self.jitter = jitter
+        self.status_codes = set(constants.RETRY_STATUS_CODES if status_codes is None else status_codes)
+        self.methods = set(constants.RETRY_METHODS if methods is None else methods)
+        self.respect_retry_after = respect_retry_after
+
+    def is_retryable(self, error):
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, APIConnectionError):
+            return True
+        return (
+            isinstance(error, APIError) and error.request is not None
+            and error.request.status_code in self.status_codes
+        )
+
+    def should_retry(self, method, attempt, error):
+        return (
+            attempt < self.max_attempts
+            and method in self.methods
+            and self.is_retryable(error)
+        )
+
+    def delay(self, attempt, error=None):
+        if self.respect_retry_after:
+            retry_after = self.retry_after(error)
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1))
+        if self.jitter:
+            return random.uniform(0, backoff)
+        return backoff
+
+    def retry_after(self, error):
+        response = getattr(error, 'request', None)
+        value = response.headers.get('Retry-After') if response is not None else None
+        if not value:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive retryable failures and then
+    # rejects requests until `reset_timeout` seconds have passed. After that
+    # a single trial request is let through; its outcome closes the circuit
+    # again or reopens it.
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = failure_threshold or constants.CIRCUIT_BREAKER_THRESHOLD
+        self.reset_timeout = constants.CIRCUIT_BREAKER_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+                raise CircuitOpenError(message='Circuit breaker is open, not sending request.')
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(api_base):
+    if not constants.CIRCUIT_BREAKER_THRESHOLD:
+        return None
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(api_base)
+        if breaker is None:
+            breaker = _circuit_breakers[api_base] = CircuitBreaker()
+    return breaker
@@ -0,0 +1,131 @@
+import json
+import sqlite3
+import threading
+from collections import namedtuple
+
+from axsemantics.bulk import bulk_map
+from axsemantics.journal import content_hash
+
+
+SyncAction = namedtuple('SyncAction', ['action', 'uid', 'id', 'data'])
+SyncPlan = namedtuple('SyncPlan', ['create', 'update', 'delete', 'unchanged'])
+
+IGNORED_FIELDS = ('id', 'content_project')
+
+
+class ThingSync:
+    # Makes the things of a content project match a local dataset keyed by
+    # uid. The local items are spooled to a temporary SQLite database, then
+    # the remote things are streamed once and compared by content hash on
+    # the fields present locally, so memory use does not grow with either
+    # side. Remote things without a local counterpart are only deleted with
+    # delete=True.
+    def __init__(self, content_project, things, delete=False, page_size=None, prefetch=None):
+        self.content_project = content_project
+        self.things = things
+        self.delete = delete
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.summary = None
+        self._lock = threading.Lock()
+        # an empty name is a private on-disk database, removed on close
+        self._connection = sqlite3.connect('', check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE local (uid TEXT PRIMARY KEY, hash TEXT, data TEXT, id INTEGER, changed INTEGER)'
+        )
+        self._connection.execute('CREATE TABLE remote (id INTEGER PRIMARY KEY, uid TEXT)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def plan(self):
+        if self.summary is None:
+            with self._lock, self._connection:
+                self._spool()
+                self._compare()
+                self.summary = self._summarize()
+        return self.summary
+
+    def actions(self):
+        self.plan()
+        queries = [
+            ('create', 'SELECT uid, NULL, data FROM local WHERE id IS NULL'),
+            ('update', 'SELECT uid, id, data FROM local WHERE changed = 1'),
+        ]
+        if self.delete:
+            queries.append(('delete', 'SELECT uid, id, NULL FROM remote'))
+
+        for action, query in queries:
+            with self._lock:
+                cursor = self._connection.execute(query)
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+                for uid, id, data in rows:
+                    yield SyncAction(action, uid, id, json.loads(data) if data else None)
+
+    def apply(self, max_workers=None, max_pending=None):
+        return bulk_map(self._apply, self.actions(), max_workers=max_workers, max_pending=max_pending)
+
+    def _apply(self, action):
+        content_project = self.content_project
+        if action.action == 'create':
+            return content_project._bind_thing(dict(action.data)).create()
+        if action.action == 'update':
+            # the PATCH carries the local fields only; a Thing built from
+            # them would add None for missing required fields
+            thing = content_project._bind_thing(action.id)
+            thing.load_data(thing.request('patch', thing.instance_url(), dict(action.data)))
+            thing.invalidate_cache()
+            return thing
+        return content_project._bind_thing(action.id).delete()
+
+    def _spool(self):
+        rows = (
+            (str(data['uid']), content_hash(data), json.dumps(data, default=str))
+            for data in (self._local_data(thing) for thing in self.things)
+        )
+        self._connection.executemany('INSERT OR REPLACE INTO local (uid, hash, data) VALUES (?, ?, ?)', rows)
+
+    def _local_data(self, thing):
+        return {key: value for key, value in dict(thing).items() if key not in IGNORED_FIELDS}
+
+    def _compare(self):
+        # Every remote thing is matched to the local item with its uid; the
+        # first match wins, further things with the same uid are extra.
+        things = self.content_project.things(page_size=self.page_size, prefetch=self.prefetch, compact=True)
+        for thing in things:
+            uid = str(thing.get('uid'))
+            row = self._connection.execute(
+                'SELECT hash, data FROM local WHERE uid = ? AND id IS NULL', (uid,)
+            ).fetchone()
+            if row is None:
+                self._connection.execute('INSERT INTO remote (id, uid) VALUES (?, ?)', (thing['id'], uid))
+                continue
+
+            hash, data = row
+            remote = {key: thing.get(key) for key in json.loads(data)}
+            self._connection.execute(
+                'UPDATE local SET id = ?, changed = ? WHERE uid = ?',
+                (thing['id'], int(content_hash(remote) != hash), uid),
+            )
+
+    def _summarize(self):
+        return SyncPlan(
+            create=self._count('SELECT COUNT(*) FROM local WHERE id IS NULL'),
+            update=self._count('SELECT COUNT(*) FROM local WHERE changed = 1'),
+            delete=self._count('SELECT COUNT(*) FROM remote') if self.delete else 0,
+            unchanged=self._count('SELECT COUNT(*) FROM local WHERE changed = 0'),
+        )
+
+    def _count(self, query):
+        return self._connection.execute(query).fetchone()[0]
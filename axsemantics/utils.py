@@ -1,54 +1,48 @@
 from axsemantics import constants
-from axsemantics.errors import (
-    APIError,
-    AuthenticationError,
+from axsemantics.auth import (
+    Authenticator,
+    set_authenticator,
 )
 from axsemantics.net import RequestHandler
 
 
-def login(user, password, api_base=None):
-    data = {
-        'email': user,
-        'password': password,
-    }
-    requestor = RequestHandler()
+def login(user, password, api_base=None, cache=None):
+    # Logs in once per user and api_base, using the token cache, and
+    # registers the credentials so that requests made with the global token
+    # can log in again when it is rejected. Pass cache=False to always log in.
+    api_base = api_base or constants.API_BASE
+    authenticator = Authenticator(
+        user, password, api_base,
+        # an empty token sends no Authorization header
+        requestor=lambda: RequestHandler(token='', api_base=api_base),
+        cache=cache,
+    )
+    constants.API_TOKEN = authenticator.login()
+    set_authenticator(authenticator)
 
-    try:
-        response = requestor.request(
-            url='/{}/rest-auth/login/'.format(constants.API_VERSION),
-            method='post',
-            params=data,
-        )
-    except APIError as error:
-        if hasattr(error, 'request') and error.request.status_code == 400:
-            raise AuthenticationError(error.request) from None
-        else:
-            raise
 
-    if constants.DEBUG:
-        print('Received authentication token {}.'.format(response['key']))
-    constants.API_TOKEN = response['key']
+# classes built by create_object for each _type, registered by the modules
+# defining them; None is the class used for any other dict
+object_types = {}
 
 
-def create_object(data, api_token=None, _type=None, **kwargs):
-    from axsemantics.resources import (
-        ContentProject,
-        Thing,
-    )
-    types = {
-        'content-project': ContentProject,
-        'thing': Thing,
-    }
+def register_type(cls, name=None):
+    object_types[name] = cls
+    return cls
 
-    if isinstance(data, list):
-        return [create_object(element, api_token, type=_type, **kwargs) for element in data]
 
-    from axsemantics.base import AXSemanticsObject
-    if isinstance(data, dict) and not isinstance(data, AXSemanticsObject):
-        data = data.copy()
+def create_object(data, api_token=None, _type=None, client=None, **kwargs):
+    if 'thing' not in object_types:
+        # registers the resource classes
+        import axsemantics.resources  # noqa
+
+    if isinstance(data, list):
+        return [create_object(element, api_token, _type=_type, client=client, **kwargs) for element in data]
 
-        _class = types.get(_type, AXSemanticsObject)
-        return _class.create_from_dict(data, api_token, **kwargs)
+    default = object_types[None]
+    if isinstance(data, dict) and not isinstance(data, default):
+        _class = object_types.get(_type, default)
+        return _class.create_from_dict(data, api_token, client=client, **kwargs)
 
     return data
 
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Checks behaviour that needs a server against benchmarks/mock_server.py and
+exits with an error if any of them fails.
+
+    python benchmarks/checks.py
+    python benchmarks/checks.py reauthentication
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import traceback
+from email.utils import formatdate
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import axsemantics
+from axsemantics import constants
+from axsemantics.aio import AsyncRequestHandler
+from axsemantics.cache import ResourceCache
+from axsemantics.errors import APIConnectionError, APIError, CircuitOpenError
+from axsemantics.net import RequestHandler
+from axsemantics.ratelimit import TokenBucket
+from axsemantics.retry import CircuitBreaker, RetryPolicy
+
+from mock_server import MockAPI, MockServer
+
+
+CHECKS = {}
+
+
+def check(function):
+    CHECKS[function.__name__[len('check_'):]] = function
+    return function
+
+
+@check
+def check_reauthentication(api):
+    # lists, their items and new lists keep working after the token in use
+    # is revoked, with one new login
+    project = api.add_project(things=30)
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    things = content_project.things(page_size=10)
+    first = [next(things) for _ in range(5)]
+    logins = api.logins
+
+    api.revoke_tokens()
+    assert len(list(things)) == 25
+    assert api.logins == logins + 1
+
+    api.revoke_tokens()
+    first[0]['name'] = 'Renamed'
+    first[0].save()
+    assert api.things[project['id']][first[0]['id']]['name'] == 'Renamed'
+
+    api.revoke_tokens()
+    assert len(list(content_project.things(page_size=10))) == 30
+    assert api.logins == logins + 3
+
+
+@check
+def check_circuit_breaker_trial(api):
+    # a trial request ending in something other than an API error, here an
+    # unencodable body and a timeout, must not leave the circuit open
+    project = api.add_project()
+    url = '/v1/content-project/{}/'.format(project['id'])
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    requestor = RequestHandler()
+    requestor.circuit_breaker = breaker
+    try:
+        requestor.request('post', '/v1/content-project/', {'name': object()})
+    except TypeError:
+        pass
+    assert requestor.request('get', url, None)['id'] == project['id']
+
+    breaker.record_failure()
+    arequestor = AsyncRequestHandler()
+    arequestor.circuit_breaker = breaker
+
+    async def timeout():
+        try:
+            await asyncio.wait_for(arequestor.request('get', url, None), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await axsemantics.close_async_sessions()
+
+    api.latency = 0.2
+    asyncio.run(timeout())
+    api.latency = 0
+    assert requestor.request('get', url, None)['id'] == project['id']
+
+
+@check
+def check_nested_edits(api):
+    # nested values changed through any accessor are saved, and never change
+    # the cached response
+    project = api.add_project(things=1, pure_data={'color': 'red'})
+    id = next(iter(api.things[project['id']]))
+    thing = axsemantics.Thing.retrieve(id, cp_id=project['id'])
+    thing.setdefault('pure_data', {})['size'] = 'L'
+    thing.save(partial=True)
+    assert api.things[project['id']][id]['pure_data'] == {'color': 'red', 'size': 'L'}
+
+    axsemantics.enable_cache()
+    try:
+        thing = axsemantics.Thing.retrieve(id, cp_id=project['id'])
+        dict(thing.items())['pure_data']['color'] = 'blue'
+        assert thing.dirty_fields() == {'pure_data': {'color': 'blue', 'size': 'L'}}
+        assert axsemantics.Thing.retrieve(id, cp_id=project['id'])['pure_data']['color'] == 'red'
+    finally:
+        axsemantics.disable_cache()
+
+
+@check
+def check_list_lookups(api):
+    # lookups by indexed, filtered and unhashable values
+    project = api.add_project(things=30, pure_data={'color': 'red'})
+    api.add_thing(project['id'], {'uid': 'blue', 'name': 'Blue', 'pure_data': {'color': 'blue'}})
+    api.add_thing(project['id'], {'uid': 'a&b +#', 'name': 'Escaped', 'pure_data': {}})
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    things = content_project.things(page_size=10)
+    assert things.get(name='Thing 12')['uid'] == '12'
+    assert things.get(uid='blue')['name'] == 'Blue'
+    assert things.get(uid='a&b +#')['name'] == 'Escaped'
+    assert things.get(pure_data={'color': 'blue'})['uid'] == 'blue'
+    assert things.get(pure_data={'color': 'green'}) is None
+    found, missing = things.get_many(['3', 'missing'])
+    assert found['name'] == 'Thing 3' and missing is None
+    things.drop_indexes()
+    assert things.get(name='Blue')['uid'] == 'blue'
+
+
+@check
+def check_list_close(api):
+    # lists left early release their prefetch threads and pages
+    project = api.add_project(things=50)
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    with content_project.things(page_size=5, prefetch=3) as things:
+        next(things)
+        assert things._executor is not None
+    assert things._executor is None and not things._pages
+
+    things = content_project.things(page_size=5, prefetch=3)
+    clones = []
+    clone = things._clone
+
+    def tracked_clone(*args, **kwargs):
+        clones.append(clone(*args, **kwargs))
+        return clones[-1]
+
+    things._clone = tracked_clone
+    assert things.get(uid='1')['name'] == 'Thing 1'
+    assert things.get(pure_data={}, name='Thing 2')['uid'] == '2'
+    assert all(clone._executor is None for clone in clones)
+
+
+@check
+def check_sync_partial_rows(api):
+    # updates send only the fields present locally
+    project = api.add_project(things=2, pure_data={'x': 0})
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    with content_project.sync_things([{'uid': '0', 'pure_data': {'x': 1}}]) as sync:
+        assert sync.plan().update == 1
+        assert [error for _, _, error in sync.apply() if error] == []
+    remote = {thing['uid']: thing for thing in api.things[project['id']].values()}
+    assert remote['0']['name'] == 'Thing 0' and remote['0']['pure_data'] == {'x': 1}
+
+
+@check
+def check_parquet_columns(api):
+    # columns that cannot be typed from the first batch, or only appear
+    # later, are an error without a schema
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        print('pyarrow is not installed, skipping')
+        return
+
+    def export(things, **kwargs):
+        project = api.add_project()
+        for thing in things:
+            api.add_thing(project['id'], dict(thing, pure_data={}))
+        content_project = axsemantics.ContentProject.retrieve(project['id'])
+        try:
+            return content_project.export(path, **kwargs)
+        except ValueError:
+            return None
+
+    batch_size = constants.EXPORT_BATCH_SIZE
+    constants.EXPORT_BATCH_SIZE = 2
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'things.parquet')
+            names = [{'uid': str(index), 'name': None if index < 2 else 'Thing'} for index in range(4)]
+            assert export(names) is None
+            assert export(names, fields=['uid', 'name']) is None
+            schema = pyarrow.schema([('uid', pyarrow.string()), ('name', pyarrow.string())])
+            assert export(names, fields=['uid', 'name'], schema=schema) == 4
+            assert pyarrow.parquet.read_table(path).column('name').to_pylist() == [None, None, 'Thing', 'Thing']
+
+            extra = [{'uid': str(index), 'name': 'Thing'} for index in range(3)]
+            extra.append({'uid': '3', 'name': 'Thing', 'extra': 1})
+            assert export(extra) is None
+    finally:
+        constants.EXPORT_BATCH_SIZE = batch_size
+
+
+@check
+def check_bulk_records(api):
+    # records of compact lists are bound as things, not as ids
+    project = api.add_project(things=5)
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    generated = list(content_project.generate_all(content_project.things(compact=True), wait=False))
+    assert [error for _, _, error in generated if error] == []
+    deleted = list(content_project.bulk_delete_things(content_project.things(compact=True)))
+    assert [error for _, _, error in deleted if error] == []
+    assert api.things[project['id']] == {}
+
+
+@check
+def check_upsert_unknown_uids(api):
+    # uids that exist in the project but not in the journal are updated,
+    # on a first run and after a crash between create() and record()
+    project = api.add_project(things=3)
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    rows = [{'uid': str(index), 'name': 'Upserted {}'.format(index), 'pure_data': {}} for index in range(4)]
+    with tempfile.TemporaryDirectory() as directory:
+        with axsemantics.ImportJournal(os.path.join(directory, 'journal.sqlite3')) as journal:
+            results = list(content_project.bulk_upsert_things(rows[:2], journal))
+            assert [error for _, _, error in results if error] == []
+            results = list(content_project.bulk_upsert_things(rows[2:], journal))
+            assert [error for _, _, error in results if error] == []
+    names = sorted(thing['name'] for thing in api.things[project['id']].values())
+    assert names == ['Upserted 0', 'Upserted 1', 'Upserted 2', 'Upserted 3']
+
+
+@check
+def check_generation_polling(api):
+    # ready things are yielded while generation is still being requested
+    # for others, and every thing exactly once
+    project = api.add_project(things=60)
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    settings = (constants.GENERATION_POLL_INTERVAL, constants.GENERATION_BATCH_THRESHOLD)
+    constants.GENERATION_POLL_INTERVAL, constants.GENERATION_BATCH_THRESHOLD = 0.01, 5
+    api.latency = 0.005
+    try:
+        results = content_project.generate_all(max_concurrency=2, timeout=10)
+        item, thing, error = next(results)
+        assert error is None
+        remote = api.things[project['id']].values()
+        assert sum(1 for thing in remote if not thing['generated_text_in_sync']) > 0
+        results = [thing] + [thing for _, thing, error in results if error is None]
+        assert sorted(thing['id'] for thing in results) == sorted(thing['id'] for thing in remote)
+    finally:
+        constants.GENERATION_POLL_INTERVAL, constants.GENERATION_BATCH_THRESHOLD = settings
+        api.latency = 0
+
+
+@check
+def check_cache_stats(api):
+    # every lookup counts as a hit or a miss, revalidated or not
+    project = api.add_project(things=1)
+    id = next(iter(api.things[project['id']]))
+    cache = axsemantics.enable_cache(ttl=0)
+    try:
+        for _ in range(3):
+            axsemantics.Thing.retrieve(id, cp_id=project['id'])
+        assert cache.stats() == {'hits': 0, 'misses': 3, 'stale': 2, 'revalidations': 2, 'size': 1}
+        cache.ttl = 60
+        axsemantics.Thing(cp_id=project['id'], id=id).invalidate_cache()
+        for _ in range(2):
+            axsemantics.Thing.retrieve(id, cp_id=project['id'])
+        assert cache.stats() == {'hits': 1, 'misses': 4, 'stale': 2, 'revalidations': 2, 'size': 1}
+    finally:
+        axsemantics.disable_cache()
+
+
+def response(status_code, **headers):
+    return SimpleNamespace(status_code=status_code, headers=headers)
+
+
+@check
+def check_retry_policy(api):
+    # what is retried, how often, and how long to wait in between
+    policy = RetryPolicy(max_attempts=3, backoff_factor=1, max_backoff=5, jitter=False)
+    unavailable = APIError(response(503))
+    assert policy.is_retryable(unavailable) and policy.is_retryable(APIConnectionError())
+    assert not policy.is_retryable(APIError(response(400))) and not policy.is_retryable(CircuitOpenError())
+    assert policy.should_retry('get', 2, unavailable)
+    assert not policy.should_retry('get', 3, unavailable)
+    assert not policy.should_retry('post', 1, unavailable)
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 2, 4, 5]
+    assert policy.delay(1, APIError(response(503, **{'Retry-After': '3'}))) == 3
+    assert policy.delay(1, APIError(response(503, **{'Retry-After': '60'}))) == 5
+    assert 0 < policy.retry_after(APIError(response(503, **{'Retry-After': formatdate(time.time() + 30)}))) <= 30
+    assert policy.retry_after(APIError(response(503, **{'Retry-After': 'soon'}))) is None
+    assert all(0 <= RetryPolicy(backoff_factor=1).delay(3) <= 4 for _ in range(20))
+
+    # both handlers retry injected errors until they succeed
+    project = api.add_project()
+    url = '/v1/content-project/{}/'.format(project['id'])
+    api.error_rate = 0.5
+    retry = RetryPolicy(max_attempts=20, backoff_factor=0)
+
+    async def arequests(requestor):
+        try:
+            return [await requestor.request('get', url, None) for _ in range(10)]
+        finally:
+            await axsemantics.close_async_sessions()
+
+    try:
+        for requestor in (RequestHandler(), AsyncRequestHandler()):
+            requestor.retry = retry
+            requests = api.requests
+            if isinstance(requestor, AsyncRequestHandler):
+                results = asyncio.run(arequests(requestor))
+            else:
+                results = [requestor.request('get', url, None) for _ in range(10)]
+            assert [result['id'] for result in results] == [project['id']] * 10
+            assert api.requests > requests + 10
+    finally:
+        api.error_rate = 0
+
+
+@check
+def check_circuit_breaker(api):
+    # opens at the threshold, lets a single trial through after the reset
+    # timeout, and closes again when it succeeds
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.is_open
+    try:
+        breaker.before_request()
+        assert False, 'request let through before the reset timeout'
+    except CircuitOpenError:
+        pass
+
+    time.sleep(0.05)
+    breaker.before_request()
+    try:
+        breaker.before_request()
+        assert False, 'second trial request let through'
+    except CircuitOpenError:
+        pass
+    breaker.record_failure()
+    assert breaker.is_open
+
+    time.sleep(0.05)
+    breaker.before_request()
+    breaker.record_success()
+    assert not breaker.is_open and breaker.failures == 0
+    breaker.before_request()
+
+
+@check
+def check_token_bucket(api):
+    # a full bucket serves its burst at once, and then one token per 1 / rate
+    # seconds, reserved in order
+    bucket = TokenBucket(rate=100, burst=5)
+    assert [bucket.reserve() for _ in range(5)] == [0] * 5
+    waits = [bucket.reserve() for _ in range(3)]
+    assert 0 < waits[0] < waits[1] < waits[2] <= 0.03
+    assert TokenBucket(rate=0.5).burst == 1
+
+    bucket = TokenBucket(rate=200, burst=1)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    asyncio.run(bucket.aacquire())
+    assert 0.02 <= time.monotonic() - start < 1
+
+
+@check
+def check_resource_cache(api):
+    # fresh and stale lookups, revalidation, eviction and invalidation
+    cache = ResourceCache(maxsize=2, ttl=60)
+    assert cache.lookup('a') is None
+    assert cache.store('a', response(200, ETag='"1"'), data={'id': 'a'}) == {'id': 'a'}
+    entry = cache.lookup('a')
+    assert entry.fresh and entry.data == {'id': 'a'}
+    assert cache.revalidation_headers(entry) == {'If-None-Match': '"1"'}
+    assert cache.revalidation_headers(None) is None
+
+    entry.expires = 0
+    assert cache.lookup('a') is entry and not entry.fresh
+    assert cache.store('a', response(304), entry) == {'id': 'a'} and entry.fresh
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'stale': 1, 'revalidations': 1, 'size': 1}
+
+    cache.store('b', response(200), data={'id': 'b'})
+    cache.lookup('a')
+    cache.store('c', response(200), data={'id': 'c'})
+    assert 'a' in cache and 'b' not in cache and 'c' in cache
+    cache.invalidate('a')
+    assert 'a' not in cache and len(cache) == 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('checks', nargs='*', metavar='check',
+                        help='checks to run: {}, default all'.format(', '.join(sorted(CHECKS))))
+    args = parser.parse_args()
+    for name in args.checks:
+        if name not in CHECKS:
+            parser.error('unknown check {}'.format(name))
+
+    failed = 0
+    for name in args.checks or sorted(CHECKS):
+        # every check gets its own server, and thereby API base and login
+        api = MockAPI(check_tokens=True)
+        with MockServer(api) as server:
+            constants.API_BASE = server.url
+            try:
+                axsemantics.login('checks@example.com', 'checks', cache=False)
+                CHECKS[name](api)
+                print('{:<30} ok'.format(name))
+            except Exception:
+                failed += 1
+                print('{:<30} FAILED'.format(name))
+                traceback.print_exc()
+            finally:
+                axsemantics.close_sessions()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Measures how long importing the package takes, each time in a fresh
+interpreter, and fails if it is slower than --max-ms or loads modules that
+should only be imported on use.
+
+    python benchmarks/import_time.py --runs 20 --max-ms 100
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# statements timed, each one after a bare interpreter start
+IMPORTS = {
+    'import': 'import axsemantics',
+    'import.thing': 'from axsemantics import Thing',
+    'import.client': 'from axsemantics import Client',
+}
+
+# modules the statements must not load
+LAZY_MODULES = ('requests', 'aiohttp')
+
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+{}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(name for name in {!r} if name in sys.modules)}}))
+'''
+
+
+def time_import(statement, runs):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    script = SCRIPT.format(statement, LAZY_MODULES)
+    samples = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT, env=env)
+        sample = json.loads(output)
+        samples.append(sample['seconds'])
+        loaded.update(sample['modules'])
+    return sorted(samples), sorted(loaded)
+
+
+def measure_imports(runs):
+    results = []
+    for name, statement in IMPORTS.items():
+        samples, loaded = time_import(statement, runs)
+        results.append({
+            'name': name,
+            'operations': runs,
+            'seconds': round(sum(samples), 4),
+            'throughput': round(runs / sum(samples), 1),
+            'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+            'p99_ms': round(samples[min(len(samples) - 1, int(round(0.99 * (len(samples) - 1))))] * 1000, 3),
+            'min_ms': round(samples[0] * 1000, 3),
+            'peak_memory_kb': None,
+            'errors': 0,
+            'lazy_modules_loaded': loaded,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='interpreter starts per statement')
+    parser.add_argument('--max-ms', type=float, help='fail if the median of "import axsemantics" is slower')
+    args = parser.parse_args()
+
+    failed = False
+    for result in measure_imports(args.runs):
+        print('{:<16} median {:>8.1f} ms  min {:>8.1f} ms  loaded {}'.format(
+            result['name'], result['p50_ms'], result['min_ms'], ', '.join(result['lazy_modules_loaded']) or '-'))
+        if result['lazy_modules_loaded']:
+            print('{} loaded {}'.format(IMPORTS[result['name']], ', '.join(result['lazy_modules_loaded'])))
+            failed = True
+        if result['name'] == 'import' and args.max_ms and result['p50_ms'] > args.max_ms:
+            print('import axsemantics took {} ms, more than {} ms'.format(result['p50_ms'], args.max_ms))
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+A local stand-in for the AX Semantics API, for benchmarks that should not
+touch the real service. It implements login, content projects, things with
+pagination, and content generation. Latency, page size and error injection
+are configurable.
+"""
+import gzip
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+CONTENT_PROJECT_URL = re.compile(r'^/v1/content-project/(?:(\d+)/)?(generate_content/)?$')
+THING_URL = re.compile(r'^/v1/content-project/(\d+)/thing/(?:(\d+)/)?(generate_content/)?$')
+
+
+class MockAPI:
+    def __init__(self, latency=0, page_size=100, error_rate=0, seed=0, check_tokens=False,
+                 compressed_requests=True, compressed_responses=True):
+        # with check_tokens, only tokens handed out by login and not revoked
+        # since are accepted; without compressed_requests, compressed bodies
+        # are answered with 415
+        self.latency = latency
+        self.check_tokens = check_tokens
+        self.compressed_requests = compressed_requests
+        self.compressed_responses = compressed_responses
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.tokens = set()
+        self.logins = 0
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.projects = {}
+        self.things = {}
+        # uids per project, which the API keeps unique
+        self.uids = {}
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add_project(self, name='Benchmark', things=0, pure_data=None):
+        project = {'id': next(self._ids), 'name': name, 'engine_configuration': 1}
+        self.projects[project['id']] = project
+        self.things[project['id']] = {}
+        self.uids[project['id']] = set()
+        for index in range(things):
+            self.add_thing(project['id'], {
+                'uid': str(index),
+                'name': 'Thing {}'.format(index),
+                'pure_data': dict(pure_data or {}),
+            })
+        return project
+
+    def add_thing(self, cp_id, data):
+        with self._lock:
+            thing = dict(data, id=next(self._ids), content_project=cp_id)
+            thing['modified'] = datetime.now(timezone.utc).isoformat()
+            thing.setdefault('generated_text_in_sync', False)
+            self.things[cp_id][thing['id']] = thing
+            self.uids[cp_id].add(str(thing.get('uid')))
+        return thing
+
+    def revoke_tokens(self):
+        with self._lock:
+            self.tokens.clear()
+
+    def handle(self, method, path, query, body, token=None):
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate and self.random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            return 503, {'detail': 'injected error'}, {'Retry-After': '0'}
+
+        if path == '/v1/rest-auth/login/':
+            with self._lock:
+                self.logins += 1
+                token = 'token-{}'.format(self.logins)
+                self.tokens.add(token)
+            return 200, {'key': token}, {}
+        if self.check_tokens and token not in self.tokens:
+            return 401, {'detail': 'Invalid token.'}, {}
+
+        match = THING_URL.match(path)
+        if match:
+            return self.handle_thing(method, int(match.group(1)), match.group(2), match.group(3), query, body)
+
+        match = CONTENT_PROJECT_URL.match(path)
+        if match:
+            if match.group(1) is None:
+                return self.paginate(list(self.projects.values()), query)
+            project = self.projects.get(int(match.group(1)))
+            if project is None:
+                return 404, {'detail': 'Not found.'}, {}
+            if match.group(2):
+                for thing in self.things[project['id']].values():
+                    thing['generated_text_in_sync'] = True
+                return 200, {}, {}
+            return 200, project, {}
+
+        return 404, {'detail': 'Not found.'}, {}
+
+    def handle_thing(self, method, cp_id, thing_id, generate, query, body):
+        things = self.things.get(cp_id)
+        if things is None:
+            return 404, {'detail': 'Not found.'}, {}
+
+        if thing_id is None:
+            if method == 'POST':
+                if str(body.get('uid')) in self.uids[cp_id]:
+                    return 400, {'uid': ['Thing with this uid already exists.']}, {}
+                return 201, self.add_thing(cp_id, body), {}
+            items = sorted(things.values(), key=lambda thing: thing['id'])
+            if query.get('ordering') == '-modified':
+                items.sort(key=lambda thing: thing['modified'], reverse=True)
+            if 'uid' in query:
+                items = [thing for thing in items if str(thing['uid']) == query['uid']]
+            return self.paginate(items, query)
+
+        thing = things.get(int(thing_id))
+        if thing is None:
+            return 404, {'detail': 'Not found.'}, {}
+        if generate:
+            thing['generated_text_in_sync'] = True
+            return 200, {}, {}
+        if method == 'GET':
+            return 200, thing, {'ETag': '"{}"'.format(thing['modified'])}
+        if method in ('PUT', 'PATCH'):
+            self.uids[cp_id].discard(str(thing.get('uid')))
+            thing.update(body)
+            self.uids[cp_id].add(str(thing.get('uid')))
+            thing['modified'] = datetime.now(timezone.utc).isoformat()
+            return 200, thing, {}
+        if method == 'DELETE':
+            self.uids[cp_id].discard(str(thing.get('uid')))
+            del things[thing['id']]
+            return 204, None, {}
+        return 405, {'detail': 'Method not allowed.'}, {}
+
+    def paginate(self, items, query):
+        page = int(query.get('page', 1))
+        page_size = int(query.get('page_size', self.page_size))
+        start = (page - 1) * page_size
+        if page < 1 or (start >= len(items) and page > 1):
+            return 404, {'detail': 'Invalid page.'}, {}
+        return 200, {
+            'count': len(items),
+            'next': 'page={}'.format(page + 1) if start + page_size < len(items) else None,
+            'previous': 'page={}'.format(page - 1) if page > 1 else None,
+            'results': items[start:start + page_size],
+        }, {}
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def log_message(self, *args):
+        pass
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                chunk = self.rfile.read(size + 2)[:size]
+                if not size:
+                    break
+                chunks.append(chunk)
+            return b''.join(chunks)
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def send_json(self, status, data, headers):
+        api = self.server.api
+        content = json.dumps(data).encode('utf-8') if data is not None else b''
+        accepted = self.headers.get('Accept-Encoding') or ''
+        if api.compressed_responses and len(content) >= 1024 and 'gzip' in accepted:
+            content = gzip.compress(content, compresslevel=1)
+            headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        api.bytes_sent += len(content)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def dispatch(self, method):
+        api = self.server.api
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.read_body()
+        api.bytes_received += len(body)
+
+        encoding = self.headers.get('Content-Encoding')
+        if encoding and not api.compressed_requests:
+            return self.send_json(415, {'detail': 'Unsupported media type.'}, {})
+        if encoding == 'gzip':
+            body = gzip.decompress(body)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+        body = json.loads(body.decode('utf-8')) if body else {}
+
+        token = (self.headers.get('Authorization') or '').replace('Token ', '', 1) or None
+        status, data, headers = api.handle(method, url.path, query, body, token)
+        etag = headers.get('ETag')
+        if etag and self.headers.get('If-None-Match') == etag:
+            status, data = 304, None
+        self.send_json(status, data, headers)
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+
+class MockServer:
+    def __init__(self, api=None, host='127.0.0.1', port=0):
+        self.api = api or MockAPI()
+        self.server = ThreadingHTTPServer((host, port), MockRequestHandler)
+        self.server.daemon_threads = True
+        self.server.api = self.api
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
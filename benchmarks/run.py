@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Runs the client against a local mock of the AX Semantics API and reports
+throughput, p50/p99 latency and peak memory for the main operations.
+Results are appended to a JSON lines file, together with the current commit,
+so runs can be compared across versions.
+
+    python benchmarks/run.py --things 1000 --latency 0.002
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import axsemantics
+from axsemantics import constants
+from axsemantics.errors import APIError
+from axsemantics.resources import Thing
+
+from import_time import measure_imports
+from mock_server import MockAPI, MockServer
+
+
+PURE_DATA = {'color': 'red', 'sizes': ['S', 'M', 'L'], 'specification': {'weight': '1kg', 'material': 'steel'}}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def measure(name, calls, units=None):
+    # calls is a list of zero-argument callables, each one timed separately;
+    # units is the number of items processed in total, for throughput
+    latencies = []
+    errors = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    for call in calls:
+        call_start = time.perf_counter()
+        try:
+            call()
+        except APIError:
+            errors += 1
+        latencies.append(time.perf_counter() - call_start)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    units = units or len(calls)
+    return {
+        'name': name,
+        'operations': units,
+        'seconds': round(seconds, 4),
+        'throughput': round(units / seconds, 1) if seconds else None,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'errors': errors,
+    }
+
+
+def consume(iterable):
+    count = 0
+    for _ in iterable:
+        count += 1
+    return count
+
+
+def consume_bulk(results):
+    # bulk helpers report failures instead of raising them
+    errors = [error for _, _, error in results if error is not None]
+    if errors:
+        raise errors[0]
+
+
+def bench_things(api, args):
+    project = api.add_project()
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    things = [
+        Thing(cp_id=project['id'], uid='new-{}'.format(index), name='New {}'.format(index), pure_data=dict(PURE_DATA))
+        for index in range(args.things)
+    ]
+    created = []
+
+    def create(thing):
+        return lambda: created.append(thing.create())
+
+    def retrieve(thing):
+        return lambda: Thing.retrieve(thing['id'], cp_id=project['id'])
+
+    def save(thing, partial):
+        def call():
+            thing['pure_data']['color'] = 'blue' if thing['pure_data']['color'] == 'red' else 'red'
+            thing.save(partial=partial)
+        return call
+
+    results = [measure('thing.create', [create(thing) for thing in things])]
+    results.append(measure('thing.retrieve', [retrieve(thing) for thing in created]))
+    results.append(measure('thing.save', [save(thing, False) for thing in created]))
+    results.append(measure('thing.save.partial', [save(thing, True) for thing in created]))
+
+    results.append(measure('content_project.retrieve', [
+        lambda: axsemantics.ContentProject.retrieve(project['id'])
+        for _ in range(args.things)
+    ]))
+
+    def retrieve_concurrently():
+        # many threads asking for the same object, as in a web tier
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(lambda _: axsemantics.ContentProject.retrieve(project['id']), range(args.workers)))
+
+    coalesce = constants.COALESCE_REQUESTS
+    try:
+        for name, constants.COALESCE_REQUESTS in (('', False), ('.coalesced', True)):
+            results.append(measure(
+                'content_project.retrieve.concurrent' + name,
+                [retrieve_concurrently for _ in range(args.things // args.workers or 1)],
+                units=(args.things // args.workers or 1) * args.workers,
+            ))
+    finally:
+        constants.COALESCE_REQUESTS = coalesce
+
+    bulk = [
+        {'uid': 'bulk-{}'.format(index), 'name': 'Bulk {}'.format(index), 'pure_data': dict(PURE_DATA)}
+        for index in range(args.things)
+    ]
+    results.append(measure(
+        'content_project.bulk_create_things',
+        [lambda: consume_bulk(content_project.bulk_create_things(bulk, max_workers=args.workers))],
+        units=len(bulk),
+    ))
+    return results
+
+
+def bench_lists(api, args):
+    project = api.add_project(things=args.things, pure_data=PURE_DATA)
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+    count = args.things * args.repeat
+    variants = [
+        ('list.things', {}),
+        ('list.things.prefetch', {'prefetch': 4}),
+        ('list.things.compact', {'compact': True}),
+    ]
+    results = [
+        measure(name, [lambda: consume(content_project.things(**kwargs))] * args.repeat, units=count)
+        for name, kwargs in variants
+    ]
+
+    things = content_project.things()
+    uids = [str(index) for index in range(0, args.things, max(1, args.things // 100))]
+    results.append(measure('list.get', [lambda uid=uid: things.get(uid=uid) for uid in uids]))
+    return results
+
+
+def bench_payloads(api, args):
+    # large things saved with each request body encoding; bytes_sent is what
+    # the server received, i.e. after compression
+    project = api.add_project()
+    pure_data = {'field_{}'.format(index): 'value {}'.format(index) for index in range(args.payload_fields)}
+    thing = Thing(cp_id=project['id'], uid='large', name='Large', pure_data=pure_data).create()
+    settings = (constants.REQUEST_COMPRESSION, constants.STREAM_REQUESTS)
+    results = []
+    try:
+        for compression, stream in ((None, False), ('gzip', False), ('deflate', False), ('gzip', True)):
+            constants.REQUEST_COMPRESSION, constants.STREAM_REQUESTS = compression, stream
+            name = 'thing.save.large.{}{}'.format(compression or 'identity', '.stream' if stream else '')
+            api.bytes_received = 0
+            result = measure(name, [lambda: thing.save() for _ in range(args.repeat * 10)])
+            result['bytes_sent'] = api.bytes_received
+            results.append(result)
+    finally:
+        constants.REQUEST_COMPRESSION, constants.STREAM_REQUESTS = settings
+    return results
+
+
+def load_excel_upload():
+    # imported by name, so that the spawned parse workers can import it as
+    # well to unpickle its functions
+    sys.path.insert(0, os.path.join(ROOT, 'bin'))
+    return importlib.import_module('excel_upload')
+
+
+def bench_excel_upload(api, args):
+    try:
+        excel_upload = load_excel_upload()
+    except ImportError as e:
+        print('Skipping excel_upload benchmarks: {}'.format(e))
+        return []
+    import openpyxl
+
+    project = api.add_project()
+    content_project = axsemantics.ContentProject.retrieve(project['id'])
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'things.xlsx')
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['MPID', 'Title English', 'Sizes', 'Specification', 'Color'])
+        for index in range(args.rows):
+            sheet.append([index, 'Row {}'.format(index), 'S~M~L', 'Weight: 1kg~Material: steel', 'red'])
+        workbook.save(path)
+
+        def rows():
+            workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+            return workbook.worksheets[0].iter_rows(values_only=True)
+
+        def parse(workers=0):
+            sheet = rows()
+            plan = excel_upload._column_plan(next(sheet, ()))
+            chunks = excel_upload._read_chunks(sheet)
+            chunks = excel_upload._in_background(excel_upload._parse_chunks(excel_upload._in_background(chunks), plan, workers))
+            return (pure_data for chunk in chunks for pure_data in chunk)
+
+        def upload():
+            consume_bulk(content_project.bulk_create_things(excel_upload._things(parse()), max_workers=args.workers))
+
+        return [
+            measure('excel_upload.parse', [lambda: consume(parse())], units=args.rows),
+            measure('excel_upload.parse.processes', [lambda: consume(parse(args.parse_workers))], units=args.rows),
+            measure('excel_upload.upload', [upload], units=args.rows),
+        ]
+
+
+def bench_imports(api, args):
+    # package import time, each in a fresh interpreter
+    return measure_imports(args.repeat * 2)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(path, config):
+    # the last run with the same configuration, as others are not comparable
+    previous = None
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    run = json.loads(line)
+                    if run.get('config') == config:
+                        previous = run
+    except FileNotFoundError:
+        pass
+    return previous
+
+
+def report(results, previous=None):
+    before = {result['name']: result for result in (previous or {}).get('results', [])}
+    print('{:<46} {:>10} {:>10} {:>10} {:>12} {:>7} {:>10} {:>9}'.format(
+        'benchmark', 'ops/s', 'p50 ms', 'p99 ms', 'peak KiB', 'errors', 'sent KiB', 'change'))
+    for result in results:
+        change = ''
+        old = before.get(result['name'])
+        if old and old.get('throughput') and result['throughput']:
+            change = '{:+.1f}%'.format((result['throughput'] / old['throughput'] - 1) * 100)
+        sent = round(result['bytes_sent'] / 1024, 1) if 'bytes_sent' in result else ''
+        peak = result['peak_memory_kb'] if result['peak_memory_kb'] is not None else ''
+        print('{:<46} {:>10} {:>10} {:>10} {:>12} {:>7} {:>10} {:>9}'.format(
+            result['name'], result['throughput'], result['p50_ms'], result['p99_ms'],
+            peak, result['errors'], sent, change))
+
+
+BENCHMARKS = {
+    'things': bench_things,
+    'lists': bench_lists,
+    'payloads': bench_payloads,
+    'excel_upload': bench_excel_upload,
+    'imports': bench_imports,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help='benchmarks to run: {}, default all'.format(', '.join(sorted(BENCHMARKS))))
+    parser.add_argument('--things', type=int, default=500, help='number of things per benchmark')
+    parser.add_argument('--rows', type=int, default=5000, help='number of excel rows')
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions of list iterations')
+    parser.add_argument('--workers', type=int, default=constants.BULK_MAX_WORKERS, help='bulk operation workers')
+    parser.add_argument('--payload-fields', type=int, default=5000, help='pure_data fields of large things')
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(), help='excel parse processes')
+    parser.add_argument('--latency', type=float, default=0, help='simulated server latency in seconds')
+    parser.add_argument('--page-size', type=int, default=100, help='server page size')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with 503')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results.jsonl'),
+                        help='JSON lines file the results are appended to')
+    parser.add_argument('--label', help='name for this run, e.g. a version or branch')
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark {}'.format(name))
+
+    api = MockAPI(latency=args.latency, page_size=args.page_size, error_rate=args.error_rate)
+    results = []
+    with MockServer(api) as server:
+        constants.API_BASE = server.url
+        axsemantics.login('benchmark@example.com', 'benchmark')
+        try:
+            for name in args.benchmarks or sorted(BENCHMARKS):
+                results.extend(BENCHMARKS[name](api, args))
+        finally:
+            axsemantics.close_sessions()
+
+    run = {
+        'label': args.label,
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': {
+            'things': args.things, 'rows': args.rows, 'repeat': args.repeat, 'workers': args.workers,
+            'parse_workers': args.parse_workers, 'payload_fields': args.payload_fields,
+            'latency': args.latency, 'page_size': args.page_size, 'error_rate': args.error_rate,
+        },
+        'requests': api.requests,
+        'results': results,
+    }
+    previous = previous_run(args.output, run['config'])
+    report(results, previous)
+    with open(args.output, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+
+if __name__ == '__main__':
+    main()
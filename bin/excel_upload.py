@@ -10,17 +10,28 @@ It expects the excel file name as command line parameter.
 Take care to include an 'name' and a 'uid' field in either your data or the
 MAPPING dict if you want to create the Objects. 
 
+The sheet is read, parsed and uploaded as overlapping stages connected by
+bounded queues, so memory stays flat and uploads start with the first chunk.
+Chunks are parsed in PARSE_WORKERS processes, so functions used in MAPPING
+must be defined at module level.
+
 Required dependencies:
     - axsemantics
-    - pandas
-    - xlrd
+    - openpyxl
 """
 import json
+import multiprocessing
 import re
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from queue import Queue
+from threading import Thread
 
 import axsemantics
-import pandas as pd
+import openpyxl
 
 # mapping helper functions
 def splitdata(field, key, row_separator, value_separator):
@@ -81,77 +92,202 @@ AXSEMANTICS_USER = 'user@example.com'
 AXSEMANTICS_PASSWORD = 'securepassword'
 AXSEMANTICS_CONTENT_PROJECT = 4004
 
+# UPLOAD_WORKERS: int
+#  - number of things to upload concurrently
+UPLOAD_WORKERS = 8
 
-def normalize_key(key):
-    pattern = re.compile('[^A-Za-z0-9_]')
-    key = key.strip()
-    key = pattern.sub('', key)
-    return key
+# JOURNAL: str or None
+#  - path of a checkpoint file recording every uploaded thing; rerunning the
+#    script then skips unchanged rows and updates changed ones instead of
+#    creating them again
+#  - None: always create all things
+JOURNAL = None
 
+# SYNC: Boolean
+#  - True: make the content project match the sheet, creating new things,
+#    updating changed ones and leaving unchanged ones alone; JOURNAL is not
+#    used then
+# SYNC_DELETE: Boolean
+#  - True: also delete things whose uid is not in the sheet
+# DRY_RUN: Boolean
+#  - True: only print what SYNC would change
+SYNC = False
+SYNC_DELETE = False
+DRY_RUN = False
 
-def _parse_row(row):
-    data = {}
+# CHUNK_SIZE: int
+#  - number of rows read and parsed at once
+# QUEUE_SIZE: int
+#  - number of chunks buffered between the read, parse and upload stages
+CHUNK_SIZE = 1000
+QUEUE_SIZE = 4
+
+# PARSE_WORKERS: int
+#  - number of processes parsing chunks in parallel, worth raising for wide
+#    sheets with many splitdata columns
+#  - 0: parse in the main process
+PARSE_WORKERS = 0
+
+KEY_PATTERN = re.compile('[^A-Za-z0-9_]')
 
-    for xslx_key in row.keys():
-        xslx_value = row[xslx_key]
 
+@lru_cache(maxsize=4096)
+def normalize_key(key):
+    return KEY_PATTERN.sub('', key.strip())
+
+
+def _column_plan(header):
+    # resolved once per sheet: (column index, column name, data field or
+    # mapping function, mapping params or None for a plain rename)
+    plan = []
+    for index, xslx_key in enumerate(header):
         if xslx_key in MAPPING:
             mapped_key = MAPPING[xslx_key]
             if isinstance(mapped_key, str):
-                data[mapped_key] = xslx_value
-
+                plan.append((index, xslx_key, mapped_key, None))
             elif isinstance(mapped_key, list):
-                try:
-                    data.update(mapped_key[0](field=xslx_value,
-                                              key=xslx_key,
-                                              **mapped_key[1],
-                                             ))
-                except:
-                    print('Failed to parse field {} with content {}.'.format(xslx_key, xslx_value))
-
-        elif IMPORT_UNCONFIGURED:
-            data[normalize_key(xslx_key)] = xslx_value
+                plan.append((index, xslx_key, mapped_key[0], mapped_key[1]))
+        elif IMPORT_UNCONFIGURED and xslx_key is not None:
+            plan.append((index, xslx_key, normalize_key(str(xslx_key)), None))
+    return plan
+
+
+def _parse_row(row, plan):
+    data = {}
+
+    for index, xslx_key, mapped_key, params in plan:
+        xslx_value = row[index] if index < len(row) else None
+
+        if params is None:
+            data[mapped_key] = xslx_value
+        else:
+            try:
+                data.update(mapped_key(field=xslx_value, key=xslx_key, **params))
+            except:
+                print('Failed to parse field {} with content {}.'.format(xslx_key, xslx_value))
     return data
 
 
+def _read_chunks(rows):
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_chunk(chunk, plan):
+    return [_parse_row(row, plan) for row in chunk]
+
+
+def _parse_chunks(chunks, plan, workers=None):
+    if workers is None:
+        workers = PARSE_WORKERS
+    if not workers:
+        for chunk in chunks:
+            yield _parse_chunk(chunk, plan)
+        return
+
+    # keeps a bounded window of chunks in flight and yields them in order;
+    # the workers are spawned, as forking while the reader thread runs can
+    # deadlock them
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_parse_chunk, chunk, plan))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _in_background(iterable):
+    # runs the iterable in its own thread, handing items over through a
+    # bounded queue, so that the stages of the pipeline overlap
+    queue = Queue(maxsize=QUEUE_SIZE)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                queue.put(item)
+        except Exception as e:
+            queue.put(e)
+        queue.put(done)
+
+    Thread(target=produce, daemon=True).start()
+    while True:
+        item = queue.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def _export(data, json_name):
+    with open(json_name, 'w') as f:
+        f.write('[')
+        for index, pure_data in enumerate(data):
+            if index:
+                f.write(', ')
+            json.dump(pure_data, f)
+        f.write(']')
+
+
+def _things(data):
+    for pure_data in data:
+        try:
+            yield {
+                'uid': pure_data['uid'],
+                'name': pure_data['name'],
+                'pure_data': pure_data,
+            }
+        except KeyError as e:
+            print('Could not create thing for data {}, missing key {}.'.format(pure_data, e))
+
+
+def _report(results):
+    for thing, result, error in results:
+        if error is None:
+            print('.' if result else '_', end='')
+        elif error.request is None:
+            print('An error occurred while saving thing {}: {}'.format(thing, error))
+        else:
+            message = '''An error occurred while saving thing {}.
+                \nMethod: {}\nResource: {}\nPayload: {}\nResponse: {} {}\n'''
+            print(message.format(thing,
+                                 error.request.request.method,
+                                 error.request.url,
+                                 error.request.request.body,
+                                 error.request.status_code,
+                                 error.request.content))
+
+
 if __name__ == '__main__':
     try:
-        xslx = pd.ExcelFile(sys.argv[-1])
+        xslx = openpyxl.load_workbook(sys.argv[-1], read_only=True, data_only=True)
     except FileNotFoundError:
         sys.exit('Could not find .xlsx file {}.'.format(sys.argv[-1]))
 
-    data = []
-    sheet = xslx.parse(0)
-    # replace float with value `nan` with none
-    sheet_with_none = sheet.where((pd.notnull(sheet)), None)
-
-    for index, row in sheet_with_none.iterrows():
-        data.append(_parse_row(row))
+    rows = xslx.worksheets[0].iter_rows(values_only=True)
+    plan = _column_plan(next(rows, ()))
+    chunks = _in_background(_parse_chunks(_in_background(_read_chunks(rows)), plan))
+    data = (pure_data for chunk in chunks for pure_data in chunk)
 
     if EXPORT is True:
-        json_name = re.sub(r'.xlsx', '.json', sys.argv[-1])
-        with open(json_name, 'w') as f:
-            json.dump(data, f)
+        _export(data, re.sub(r'.xlsx', '.json', sys.argv[-1]))
     else:
         axsemantics.login(AXSEMANTICS_USER, AXSEMANTICS_PASSWORD)
-        for pure_data in data:
-            try:
-                thing = axsemantics.Thing(
-                    uid=pure_data['uid'],
-                    name=pure_data['name'],
-                    pure_data=pure_data,
-                    cp_id=AXSEMANTICS_CONTENT_PROJECT,
-                )
-                thing.create()
-                print('.', end='')
-            except KeyError as e:
-                print('Could not create thing for data {}, missing key {}.'.format(pure_data, e))
-            except axsemantics.APIError as e:
-                message = '''An error occurred while saving thing {}.
-                    \nMethod: {}\nResource: {}\nPayload: {}\nResponse: {} {}\n'''
-                print(message.format(thing,
-                                     e.request.request.method,
-                                     e.request.url,
-                                     e.request.request.body,
-                                     e.request.status_code,
-                                     e.request.content))
+        content_project = axsemantics.ContentProject(id=AXSEMANTICS_CONTENT_PROJECT)
+        if SYNC:
+            with content_project.sync_things(_things(data), delete=SYNC_DELETE) as sync:
+                print('{} to create, {} to update, {} to delete, {} unchanged.'.format(*sync.plan()))
+                if not DRY_RUN:
+                    _report(sync.apply(max_workers=UPLOAD_WORKERS))
+        elif JOURNAL:
+            journal = axsemantics.ImportJournal(JOURNAL)
+            _report(content_project.bulk_upsert_things(_things(data), journal, max_workers=UPLOAD_WORKERS))
+        else:
+            _report(content_project.bulk_create_things(_things(data), max_workers=UPLOAD_WORKERS))
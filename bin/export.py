@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+This is an example script demonstrating the usage of the axsemantics API client.
+Please use the configuration section below to customize behaviour and proceed
+at your own risk.
+
+This script will export all things of a given content project to a file. It
+expects the output file name as command line parameter; the format and the
+compression are derived from its extension, e.g. things.ndjson.gz,
+things.csv or things.parquet.
+
+Things are written page by page as they arrive, so memory usage does not
+grow with the size of the project.
+
+Required dependencies:
+    - axsemantics
+    - pyarrow (for parquet only)
+"""
+import sys
+
+import axsemantics
+
+# FIELDS: list or None
+#  - None: export all fields
+#  - ['uid', 'name', ...]: only export these fields, in this order
+FIELDS = None
+
+# AXSEMANTICS_*: values to use with the axsemantics library
+AXSEMANTICS_USER = 'user@example.com'
+AXSEMANTICS_PASSWORD = 'securepassword'
+AXSEMANTICS_CONTENT_PROJECT = 4004
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('Usage: {} <output file>'.format(sys.argv[0]))
+
+    axsemantics.login(AXSEMANTICS_USER, AXSEMANTICS_PASSWORD)
+    content_project = axsemantics.ContentProject(id=AXSEMANTICS_CONTENT_PROJECT)
+    count = content_project.export(sys.argv[-1], fields=FIELDS)
+    print('Exported {} things to {}.'.format(count, sys.argv[-1]))
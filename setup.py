@@ -19,14 +19,24 @@ setup(
         'License :: OSI Approved :: MIT License',
 
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
     ],
 
+    python_requires = '>=3.7',
+
     packages = ['axsemantics'],
 
     install_requires = [
-        'requests==2.9.1',
+        'requests>=2.31.0',
     ],
+
+    extras_require = {
+        'async': ['aiohttp'],
+        'parquet': ['pyarrow'],
+    },
 )